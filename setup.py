@@ -3,12 +3,16 @@ from setuptools import setup, find_packages
 setup(
     name='dupes',
     version='0.1.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=('tests', 'tests.*')),
     include_package_data=True,
     install_requires=[
         'click>=8.0.0',
         'rich>=13.0.0',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+        'test': ['pytest'],
+    },
     entry_points={
         'console_scripts': [
             'dupes = src.cli:main',
@@ -0,0 +1,233 @@
+import os
+import time
+import pickle
+import tempfile
+import tracemalloc
+from src.hash_helper import HashHelper
+from src.hash_store import HashStore
+from src.files_helper import FilesHelper
+from src.path_filter import PathFilter
+from src.constants import ALGORITHMS
+from src.constants import READ_METHODS
+from src.constants import DEFAULT_ALGORITHM
+
+class Benchmark:
+    """
+    Micro-benchmarks that help pick settings for the local machine.
+    """
+
+    @staticmethod
+    def algorithms(size_mb: int = 256, algorithms: tuple = ALGORITHMS) -> dict:
+        """
+        Measure the throughput of each digest algorithm on in-memory data.
+
+        The data is fed in 64 KB chunks, like HashHelper.hash_file does, so the
+        numbers reflect digest speed without any disk I/O.
+
+        Args:
+            size_mb (int, optional): Amount of data to hash per algorithm, in MB. Defaults to 256.
+            algorithms (tuple, optional): The algorithms to measure. Defaults to ALGORITHMS.
+        Returns:
+            dict: Maps each algorithm to its throughput in MB/s.
+        """
+        chunk = memoryview(os.urandom(65536))
+        chunks = max(1, size_mb * 1024 * 1024 // len(chunk))
+        results = {}
+
+        for algorithm in algorithms:
+            digest = HashHelper.new_hash(algorithm)
+            start = time.perf_counter()
+            for _ in range(chunks):
+                digest.update(chunk)
+            digest.digest()
+            elapsed = time.perf_counter() - start
+            results[algorithm] = (chunks * len(chunk)) / (1024 * 1024) / max(elapsed, 1e-9)
+
+        return results
+
+    @staticmethod
+    def read_methods(size_mb: int = 256, algorithm: str = DEFAULT_ALGORITHM, repeat: int = 3) -> dict:
+        """
+        Measure the throughput of each way HashHelper.hash_file can read a file.
+
+        A temporary file is hashed with every method, including the automatic
+        choice, and the best of several runs is kept so that all methods are
+        measured against a warm page cache.
+
+        Args:
+            size_mb (int, optional): Size of the temporary file, in MB. Defaults to 256.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+            repeat (int, optional): Runs per method. Defaults to 3.
+        Returns:
+            dict: Maps each method, and 'auto', to its throughput in MB/s.
+        """
+        fd, path = tempfile.mkstemp(prefix='dupes-benchmark-')
+        results = {}
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                chunk = os.urandom(1024 * 1024)
+                for _ in range(size_mb):
+                    f.write(chunk)
+
+            for method in ('auto',) + READ_METHODS:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    HashHelper.hash_file(path, algorithm=algorithm, method=None if method == 'auto' else method)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                results[method] = size_mb / max(best, 1e-9)
+        finally:
+            os.remove(path)
+
+        return results
+
+    @staticmethod
+    def catalog_memory(entries: int = 100000, algorithm: str = DEFAULT_ALGORITHM) -> dict:
+        """
+        Measure the footprint of the pickle store's catalog against full path keys.
+
+        A catalog of the given number of files, a hundred per directory in a
+        nested tree, is built through HashStore.apply_record like the pickle
+        store builds it. It is measured as the store saves it, with paths
+        interned through the directory table, and in the path-keyed layout of
+        exports, which holds the full path of every entry. Each layout is
+        pickled, and the Python heap usage of loading it back is recorded.
+
+        Args:
+            entries (int, optional): Number of catalogued files. Defaults to 100000.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            dict: Maps 'full paths' and 'directory table' to a (heap bytes, pickle bytes) pair.
+        """
+        paths, catalog = Benchmark._sample_catalog(entries, algorithm)
+        layouts = {'full paths': HashStore.exported(catalog), 'directory table': HashStore.snapshot(catalog)}
+        catalog = None
+
+        return {
+            'full paths': Benchmark._load_footprint(layouts.pop('full paths')),
+            'directory table': Benchmark._load_footprint(layouts.pop('directory table'), paths[0]),
+        }
+
+    @staticmethod
+    def digest_memory(entries: int = 100000, algorithm: str = DEFAULT_ALGORITHM) -> dict:
+        """
+        Measure the footprint of the pickle store's catalog with hex digests against raw digests.
+
+        The catalog of catalog_memory is measured as the store saves it, and
+        once more with each digest replaced by its hexdigest() string, in the
+        file records and as group keys, as catalogs held them before digests
+        were kept as raw bytes. A record and its group share one string, like
+        they share one bytes object.
+
+        Args:
+            entries (int, optional): Number of catalogued files. Defaults to 100000.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            dict: Maps 'hex' and 'binary' to a (heap bytes, pickle bytes) pair.
+        """
+        paths, catalog = Benchmark._sample_catalog(entries, algorithm)
+        snapshot = HashStore.snapshot(catalog)
+        hex_digests = {digest: digest.hex() for digest in catalog['files']}
+        hexed = dict(
+            snapshot,
+            files={hex_digests[digest]: group for digest, group in catalog['files'].items()},
+            records={
+                dir_id: {name: (hex_digests.get(record[0]),) + record[1:] for name, record in records.items()}
+                for dir_id, records in catalog['records'].items()
+            },
+        )
+        catalog = hex_digests = None
+
+        return {
+            'hex': Benchmark._load_footprint(hexed, paths[0]),
+            'binary': Benchmark._load_footprint(snapshot, paths[0]),
+        }
+
+    @staticmethod
+    def _sample_catalog(entries: int, algorithm: str) -> tuple:
+        """
+        Build the pickle-store catalog measured by catalog_memory and digest_memory.
+
+        Args:
+            entries (int): Number of catalogued files, a hundred per directory in a nested tree.
+            algorithm (str): The digest algorithm.
+        Returns:
+            tuple: (paths, catalog), the file paths and the hashes structure holding them.
+        """
+        paths = [f"/srv/share/projects/project{i // 10000}/src/module{i // 100}/file{i}" for i in range(entries)]
+        catalog = HashHelper.empty_hashes()
+        for i, path in enumerate(paths):
+            digest = HashHelper.new_hash(algorithm)
+            digest.update(path.encode('utf-8'))
+            HashStore.apply_record(catalog, ('files', digest.digest(), path, (1, i, 4096, 0)))
+        return paths, catalog
+
+    @staticmethod
+    def _load_footprint(layout: dict, lookup: str = None) -> tuple:
+        """
+        Pickle a catalog layout and measure the Python heap usage of loading it back.
+
+        Args:
+            layout (dict): The structure to measure.
+            lookup (str, optional): A path looked up in the loaded directory table, so the
+                path index its first lookup builds is measured too.
+        Returns:
+            tuple: (heap bytes, pickle bytes).
+        """
+        pickled = pickle.dumps(layout, protocol=pickle.HIGHEST_PROTOCOL)
+        layout = None
+        tracemalloc.start()
+        loaded = pickle.loads(pickled)
+        if lookup is not None:
+            HashStore.file_key(loaded, lookup)
+        heap, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        loaded = None
+        return heap, len(pickled)
+
+    @staticmethod
+    def filter_pruning(root: str, exclude: tuple = (), include: tuple = ()) -> dict:
+        """
+        Count the directory listings and stat calls that pruning excluded subtrees saves.
+
+        The tree is walked twice, like the hashing walk does, with one stat
+        call per entry. The first walk lists everything and drops the excluded
+        entries afterwards; the second one skips them before they are listed
+        or stat'ed. Both keep the same files. Symbolic links are not followed.
+
+        Args:
+            root (str): The directory to walk.
+            exclude (tuple, optional): Exclude patterns, on top of those of .dupesignore files.
+            include (tuple, optional): Include patterns.
+        Returns:
+            dict: Maps 'after walk' and 'pruned' to a (directories listed, entries stat'ed,
+                seconds) tuple.
+        """
+        results = {}
+
+        for name, prune in (('after walk', False), ('pruned', True)):
+            listed = stated = 0
+            start = time.perf_counter()
+            stack = [(root, PathFilter(root, exclude, include), False)]
+            while stack:
+                dir_path, path_filter, excluded = stack.pop()
+                entries = FilesHelper.scan_dir(dir_path) or []
+                listed += 1
+                path_filter = path_filter.enter(dir_path, entries)
+                for entry in entries:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    skipped = excluded or path_filter.skips(entry.path, is_dir)
+                    if skipped and prune:
+                        continue
+                    try:
+                        entry.stat(follow_symlinks=False)
+                        stated += 1
+                    except OSError:
+                        continue
+                    if is_dir:
+                        stack.append((entry.path, path_filter, skipped))
+            results[name] = (listed, stated, time.perf_counter() - start)
+
+        return results
@@ -1,10 +1,17 @@
+import os
+import math
+import time
+import pickle
 import click
 from rich.console import Console
 from rich.table import Table
 from src.dupes import Dupes
-from src.hash_helper import HashHelper
+from src.hash_store import open_store, catalog_algorithm
+from src.benchmark import Benchmark
+from src.scan_state import ScanState
 from src.logger import Logger, SimpleLogger
-from src.constants import HASHES_PICKLE_PATH
+from src.constants import BACKENDS, DEFAULT_BACKEND, EXECUTORS, ALGORITHMS, DEFAULT_ALGORITHM, PRUNE_JOBS
+from src.constants import SYMLINK_POLICIES, DEFAULT_SYMLINK_POLICY, SCAN_STATE_PATH
 
 console = Console()
 
@@ -13,43 +20,141 @@ def main():
     """A CLI tool to detect duplicate files based on their hashes."""
     pass
 
+class ByteSize(click.ParamType):
+    """A number of bytes, optionally with a binary unit suffix, e.g. '4K' or '1.5G'."""
+    
+    name = 'size'
+    units = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+    
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+        text = value.strip().upper().removesuffix('B').removesuffix('I')
+        unit = text[-1:] if text[-1:] in self.units else ''
+        try:
+            size = float(text[:len(text) - len(unit)])
+        except ValueError:
+            self.fail(f"{value!r} is not a size such as 4096, 4K or 1.5G", param, ctx)
+        if not math.isfinite(size):
+            self.fail(f"{value!r} is not a finite size", param, ctx)
+        if size < 0:
+            self.fail(f"{value!r} is negative", param, ctx)
+        return int(size * self.units[unit])
+
+backend_option = click.option(
+    '--backend', type=click.Choice(BACKENDS), default=DEFAULT_BACKEND, show_default=True,
+    help='Storage backend for the hash catalog.'
+)
+
 @main.command()
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose output.')
-@click.argument('dirs', nargs=-1, type=click.Path(exists=True), required=True)
-def process_dir(verbose: bool, dirs: list[str]):
+@backend_option
+@click.option('--size-prefilter', is_flag=True, help='Only hash files whose size matches another file.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1, show_default=True,
+              help='Number of workers reading and hashing files.')
+@click.option('--executor', type=click.Choice(EXECUTORS), default='thread', show_default=True,
+              help='Hash in a pool of threads, or of processes for CPU-bound workloads.')
+@click.option('--algorithm', type=click.Choice(ALGORITHMS), default=None,
+              help=f'Digest algorithm. Defaults to the catalog\'s, or {DEFAULT_ALGORITHM} for a new catalog.')
+@click.option('--trust-dir-mtime', is_flag=True,
+              help='Reuse stored file hashes in directories whose mtime is unchanged, without checking '
+                   'each file. Misses files rewritten in place.')
+@click.option('--symlinks', type=click.Choice(SYMLINK_POLICIES), default=DEFAULT_SYMLINK_POLICY, show_default=True,
+              help='Follow symbolic links, record the links themselves, or skip them.')
+@click.option('--exclude', multiple=True, metavar='PATTERN',
+              help='Glob pattern of files and directories to leave out; can be repeated.')
+@click.option('--include', multiple=True, metavar='PATTERN',
+              help='Glob pattern of the files to hash; can be repeated. Defaults to all files.')
+@click.option('--min-size', type=ByteSize(), default=0, help='Leave out files smaller than this, e.g. 4K.')
+@click.option('--max-size', type=ByteSize(), default=None, help='Leave out files larger than this, e.g. 2G.')
+@click.option('--one-file-system', '-x', is_flag=True,
+              help='Do not descend into directories on other file systems than the one of each DIR.')
+@click.option('--resume', is_flag=True,
+              help='Continue an interrupted run from its last checkpoint, with the directories and options it had.')
+@click.argument('dirs', nargs=-1, type=click.Path(exists=True))
+def process_dir(
+    verbose: bool, backend: str, size_prefilter: bool, jobs: int, executor: str, algorithm: str,
+    trust_dir_mtime: bool, symlinks: str, exclude: tuple, include: tuple, min_size: int, max_size: int,
+    one_file_system: bool, resume: bool, dirs: list[str]
+):
     """Process the given directories."""
     
-    # Use SimpleLogger for the counting phase
+    # Use SimpleLogger until the live display starts
     simple_logger = SimpleLogger(verbose=verbose)
     
     try:
-        simple_logger.info("Scanning directories to count items...")
-        
-        dupes_counter = Dupes(verbose=verbose, logger=simple_logger)
-        total_files = 0
-        total_dirs = 0
+        if resume:
+            if dirs:
+                simple_logger.error("--resume continues the directories of the interrupted run; do not pass DIRS")
+                return
+            scan_state = ScanState.load(verbose=verbose, logger=simple_logger)
+            if scan_state is None:
+                simple_logger.error("No interrupted run to resume")
+                return
+            # The run continues with the options it was started with; only --jobs and --executor may change
+            options = scan_state.options
+            backend, size_prefilter, algorithm = options['backend'], options['size_prefilter'], options['algorithm']
+            trust_dir_mtime, symlinks = options['trust_dir_mtime'], options['symlinks']
+            exclude, include = options['exclude'], options['include']
+            min_size, max_size, one_file_system = options['min_size'], options['max_size'], options['one_file_system']
+            dirs = list(scan_state.roots)
+            simple_logger.info(f"Resuming the interrupted run, {len(dirs)} directories to go")
+        elif not dirs:
+            simple_logger.error("Missing argument 'DIRS...'; pass the directories to process, or --resume")
+            return
+        elif max_size is not None and min_size > max_size:
+            simple_logger.error(f"--min-size ({min_size:,} B) is larger than --max-size ({max_size:,} B)")
+            return
+        else:
+            scan_state = ScanState(dirs, {
+                'backend': backend, 'size_prefilter': size_prefilter, 'algorithm': algorithm,
+                'trust_dir_mtime': trust_dir_mtime, 'symlinks': symlinks, 'exclude': exclude, 'include': include,
+                'min_size': min_size, 'max_size': max_size, 'one_file_system': one_file_system,
+            })
         
-        for dir_path in dirs:
-            try:
-                counts = dupes_counter.count_items(dir_path)
-                total_files += counts['files']
-                total_dirs += counts['dirs']
-            except Exception as e:
-                simple_logger.error(f"Error counting items in {dir_path}: {str(e)}")
-                continue
+        store = open_store(backend, verbose=verbose, logger=simple_logger)
+        stored_algorithm = catalog_algorithm(store)
+        store.close()
         
-        if total_files == 0 and total_dirs == 0:
-            simple_logger.error("No accessible files or directories found to process")
+        if algorithm is not None and stored_algorithm not in (None, algorithm):
+            simple_logger.error(f"The catalog was built with {stored_algorithm}, not {algorithm}")
+            simple_logger.info(f"Run 'dupes clear-hashes' first, or use --algorithm {stored_algorithm}")
             return
         
-        simple_logger.info(f"Found {total_files} files and {total_dirs} directories to process")
-        
         logger = Logger(verbose=verbose, max_log_lines=15)
-        dupes = Dupes(verbose=verbose, logger=logger)
+        dupes = Dupes(
+            verbose=verbose, logger=logger, backend=backend, jobs=jobs, executor=executor, algorithm=algorithm,
+            trust_dir_mtime=trust_dir_mtime, symlinks=symlinks, exclude=exclude, include=include,
+            min_size=min_size, max_size=max_size, one_file_system=one_file_system, scan_state=scan_state,
+        )
+        
+        if size_prefilter and resume:
+            dupes.hash_candidates = scan_state.load_candidates(verbose=verbose, logger=simple_logger)
         
-        # Start the live display with progress bar
+        if size_prefilter and dupes.hash_candidates is None:
+            # The prefilter has to know every size before the first file is hashed;
+            # the listings read here are reused by the hashing pass.
+            simple_logger.info("Scanning directories to group files by size...")
+            size_groups = {}
+            
+            for dir_path in dirs:
+                try:
+                    dupes.count_items(dir_path, size_groups=size_groups)
+                except Exception as e:
+                    simple_logger.error(f"Error scanning {dir_path}: {str(e)}")
+                    continue
+            
+            simple_logger.info("Comparing sizes and head/tail blocks of candidate files...")
+            dupes.prefilter(size_groups, verbose=verbose)
+            size_groups = None
+            scan_state.save_candidates(dupes.hash_candidates, verbose=verbose, logger=simple_logger)
+        
+        # From here on an interrupted run can be resumed
+        scan_state.save(verbose=verbose, logger=simple_logger)
+        
+        # Start the live display with progress bar. Its total grows as directories are discovered.
         logger.start()
-        task_id = logger.add_task("Processing files and directories", total=total_files)
+        task_id = logger.add_task("Processing files and directories", total=0)
         
         for dir_path in dirs:
             try:
@@ -57,10 +162,52 @@ def process_dir(verbose: bool, dirs: list[str]):
                 dupes.reursive_hash(dir_path, verbose, task_id=task_id)
             except Exception as e:
                 logger.error(f"Error processing directory {dir_path}: {str(e)}")
-                continue
+            dupes.finish_root(dir_path)
+        
+        dupes.close()
+        ScanState.clear()
+        
+        if dupes.file_count == 0 and dupes.dir_count == 0:
+            logger.stop()
+            simple_logger.error("No accessible files or directories found to process")
+            return
         
         logger.success(f"Completed processing {dupes.file_count} files and {dupes.dir_count} directories")
         
+        if dupes.reused_count > 0:
+            logger.info(f"Reused stored hashes for {dupes.reused_count} unchanged files")
+        
+        if dupes.reused_dir_count > 0:
+            logger.info(f"Kept stored hashes for {dupes.reused_dir_count} unchanged directories")
+        
+        if dupes.hardlink_count > 0:
+            logger.info(f"Reused hashes for {dupes.hardlink_count} hardlinks of already hashed files")
+        
+        if dupes.symlink_count > 0:
+            action = 'Skipped' if symlinks == 'skip' else 'Recorded'
+            logger.info(f"{action} {dupes.symlink_count} symbolic links without following them")
+        
+        if dupes.excluded_count > 0:
+            logger.info(f"Left out {dupes.excluded_count} excluded files and directories")
+        
+        if dupes.size_skipped_count > 0:
+            logger.info(f"Left out {dupes.size_skipped_count} files outside the size limits")
+        
+        if dupes.empty_count > 0:
+            logger.info(f"Recorded {dupes.empty_count} empty files without reading them")
+        
+        if dupes.special_count > 0:
+            logger.info(f"Skipped {dupes.special_count} FIFOs, sockets and device files")
+        
+        if dupes.loop_count > 0:
+            logger.warning(f"Skipped {dupes.loop_count} symbolic links leading back into their own tree")
+        
+        if dupes.stage_stats:
+            logger.info(
+                f"Prefilter eliminated {dupes.stage_stats['size']} files by size, "
+                f"{dupes.stage_stats['head']} by head block and {dupes.stage_stats['tail']} by tail block"
+            )
+        
         if dupes.error_count > 0:
             logger.warning(f"Encountered {dupes.error_count} errors during processing")
         
@@ -68,7 +215,7 @@ def process_dir(verbose: bool, dirs: list[str]):
         logger.stop()
         
         logger.print("\n✨ [bold green]Processing complete![/bold green]", style="bold")
-        logger.print(f"Hashes saved to [cyan]{HASHES_PICKLE_PATH}[/cyan]")
+        logger.print(f"Hashes saved to [cyan]{dupes.store.location}[/cyan]")
         
         if dupes.error_count > 0:
             logger.print(f"\n[yellow]⚠ Warning:[/yellow] {dupes.error_count} items were skipped due to errors")
@@ -80,15 +227,26 @@ def process_dir(verbose: bool, dirs: list[str]):
                 if len(dupes.skipped_items) > 10:
                     logger.print(f"  [dim]... and {len(dupes.skipped_items) - 10} more[/dim]")
         
+        if dupes.skipped_mounts:
+            logger.print(f"\nSkipped {len(dupes.skipped_mounts)} mount points on other file systems:")
+            for mount in dupes.skipped_mounts:
+                logger.print(f"  [dim]- {mount}[/dim]")
+        
     except KeyboardInterrupt:
+        if 'dupes' in locals():
+            dupes.close()
         if 'logger' in locals():
             logger.stop()
             logger.print("\n[yellow]Processing interrupted by user[/yellow]")
             if 'dupes' in locals() and dupes.file_count > 0:
                 logger.print(f"[dim]Processed {dupes.file_count} files before interruption[/dim]")
+            if os.path.exists(SCAN_STATE_PATH):
+                logger.print("[dim]Run 'dupes process-dir --resume' to continue from the last checkpoint[/dim]")
         else:
             simple_logger.print("\n[yellow]Processing interrupted by user[/yellow]")
     except Exception as e:
+        if 'dupes' in locals():
+            dupes.close()
         if 'logger' in locals():
             logger.stop()
             logger.print(f"\n[bold red]Unexpected error:[/bold red] {str(e)}")
@@ -101,18 +259,43 @@ def process_dir(verbose: bool, dirs: list[str]):
                 import traceback
                 simple_logger.print(f"\n[dim]{traceback.format_exc()}[/dim]")
 
+def format_size(num_bytes: int) -> str:
+    """Format a number of bytes for display, e.g. '1.5 MB'."""
+    size = float(num_bytes)
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:,.0f} {unit}" if unit == 'B' else f"{size:,.1f} {unit}"
+        size /= 1024
+
+def run_prune(dupes: Dupes, logger, jobs: int = PRUNE_JOBS) -> None:
+    """Prune stale catalog entries and report how many were removed and how long it took."""
+    logger.info("Checking catalogued paths for stale entries...")
+    start = time.perf_counter()
+    checked, removed = dupes.prune(jobs=jobs)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Pruned {removed} of {checked} catalog entries in {elapsed:.2f}s")
+
 @main.command()
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose output.')
-def detect_duplicates(verbose: bool):
+@backend_option
+@click.option('--prune', 'prune_first', is_flag=True,
+              help='Remove entries for paths that vanished or changed before looking for duplicates.')
+@click.option('--prune-jobs', type=click.IntRange(min=1), default=PRUNE_JOBS, show_default=True,
+              help='Number of threads checking catalogued paths with --prune.')
+def detect_duplicates(verbose: bool, backend: str, prune_first: bool, prune_jobs: int):
     """Detect and print duplicate files based on their hashes."""
     
     logger = SimpleLogger(verbose=verbose)
     
     try:
-        dupes = Dupes(verbose=verbose)
+        dupes = Dupes(verbose=verbose, backend=backend)
+        
+        if prune_first:
+            run_prune(dupes, logger, jobs=prune_jobs)
         
         logger.info("Analyzing hashes for duplicates...")
         duplicates = dupes.detect_duplicates(verbose=verbose)
+        dupes.close()
 
         duplicated_dirs_exist = len(duplicates['dirs'].items()) > 0
         duplicated_files_exist = len(duplicates['files'].items()) > 0
@@ -130,7 +313,7 @@ def detect_duplicates(verbose: bool):
                     table.add_row(dir_path)
                 
                 console.print(table)
-                console.print(f"[dim]Hash: {hash_value}[/dim]\n")
+                console.print(f"[dim]Hash: {hash_value.hex()}[/dim]\n")
         else:
             console.print("[green]✓ No duplicate folders found[/green]\n")
         
@@ -140,12 +323,19 @@ def detect_duplicates(verbose: bool):
             for idx, (hash_value, files) in enumerate(duplicates['files'].items(), 1):
                 table = Table(title=f"Group {idx}", show_header=False, border_style="magenta")
                 table.add_column("Path", style="yellow")
+                links = duplicates['links'].get(hash_value, set())
                 
                 for file_path in files:
-                    table.add_row(file_path)
+                    table.add_row(f"{file_path} [dim](hardlink)[/dim]" if file_path in links else file_path)
                 
                 console.print(table)
-                console.print(f"[dim]Hash: {hash_value}[/dim]\n")
+                size = duplicates['sizes'].get(hash_value, -1)
+                if size >= 0:
+                    console.print(
+                        f"[dim]Size: {format_size(size)} each, "
+                        f"{format_size(size * (len(files) - len(links) - 1))} reclaimable[/dim]"
+                    )
+                console.print(f"[dim]Hash: {hash_value.hex()}[/dim]\n")
         else:
             console.print("[green]✓ No duplicate files found[/green]\n")
         
@@ -155,11 +345,13 @@ def detect_duplicates(verbose: bool):
                 f"Found {len(duplicates['dirs'])} duplicate folder groups "
                 f"and {len(duplicates['files'])} duplicate file groups"
             )
+            if duplicated_files_exist:
+                logger.info(f"Keeping one copy of each duplicate file would free {format_size(duplicates['reclaimable'])}")
         else:
             logger.success("No duplicates found!")
             
     except FileNotFoundError:
-        logger.error(f"Hash file not found at {HASHES_PICKLE_PATH}")
+        logger.error(f"Hash catalog not found for the {backend} backend")
         logger.info("Run 'dupes process-dir <directory>' first to generate hashes")
     except Exception as e:
         logger.error(f"Error detecting duplicates: {str(e)}")
@@ -169,16 +361,40 @@ def detect_duplicates(verbose: bool):
 
 @main.command()
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose output.')
-def clear_hashes(verbose: bool):
+@backend_option
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=PRUNE_JOBS, show_default=True,
+              help='Number of threads checking catalogued paths.')
+def prune(verbose: bool, backend: str, jobs: int):
+    """Remove catalog entries for paths that vanished or changed since they were hashed."""
+    
+    logger = SimpleLogger(verbose=verbose)
+    
+    try:
+        dupes = Dupes(verbose=verbose, logger=logger, backend=backend)
+        run_prune(dupes, logger, jobs=jobs)
+        dupes.close()
+    except Exception as e:
+        logger.error(f"Error pruning hashes: {str(e)}")
+        if verbose:
+            import traceback
+            console.print(f"\n[dim]{traceback.format_exc()}[/dim]")
+
+@main.command()
+@click.option('--verbose', '-v', is_flag=True, help='Enable verbose output.')
+@backend_option
+def clear_hashes(verbose: bool, backend: str):
     """Clear all stored hashes."""
     
     logger = SimpleLogger(verbose=verbose)
     
     try:
         if click.confirm("Are you sure you want to clear all stored hashes?"):
-            success = HashHelper.clear_hashes(verbose=verbose, logger=logger)
+            store = open_store(backend, verbose=verbose, logger=logger)
+            success = store.clear()
+            store.close()
+            ScanState.clear()  # A resumed run would miss the hashes recorded before the clear
             if success:
-                logger.success(f"Cleared all hashes from {HASHES_PICKLE_PATH}")
+                logger.success(f"Cleared all hashes from {store.location}")
             else:
                 logger.error("Failed to clear hashes")
         else:
@@ -189,5 +405,167 @@ def clear_hashes(verbose: bool):
             import traceback
             console.print(f"\n[dim]{traceback.format_exc()}[/dim]")
 
+@main.command()
+@click.option('--verbose', '-v', is_flag=True, help='Enable verbose output.')
+@backend_option
+@click.argument('path', type=click.Path(dir_okay=False))
+def export_hashes(verbose: bool, backend: str, path: str):
+    """Export the hash catalog to a pickle file."""
+    
+    logger = SimpleLogger(verbose=verbose)
+    
+    try:
+        store = open_store(backend, verbose=verbose, logger=logger)
+        hashes = store.export_hashes()
+        store.close()
+        
+        with open(path, 'wb') as f:
+            pickle.dump(hashes, f, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        logger.success(
+            f"Exported {len(hashes['files'])} file hashes and "
+            f"{len(hashes['dirs'])} directory hashes to {path}"
+        )
+    except Exception as e:
+        logger.error(f"Error exporting hashes: {str(e)}")
+        if verbose:
+            import traceback
+            console.print(f"\n[dim]{traceback.format_exc()}[/dim]")
+
+@main.command()
+@click.option('--verbose', '-v', is_flag=True, help='Enable verbose output.')
+@backend_option
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_hashes(verbose: bool, backend: str, path: str):
+    """Import a pickle file of hashes into the hash catalog."""
+    
+    logger = SimpleLogger(verbose=verbose)
+    
+    try:
+        with open(path, 'rb') as f:
+            hashes = pickle.load(f)
+        
+        if not isinstance(hashes, dict) or 'files' not in hashes or 'dirs' not in hashes:
+            logger.error(f"Invalid hash file structure in {path}")
+            return
+        
+        store = open_store(backend, verbose=verbose, logger=logger)
+        stored_algorithm = catalog_algorithm(store)
+        imported_algorithm = hashes.get('meta', {}).get('algorithm', DEFAULT_ALGORITHM)
+        
+        if stored_algorithm not in (None, imported_algorithm):
+            store.close()
+            logger.error(f"The catalog was built with {stored_algorithm}, but {path} uses {imported_algorithm}")
+            return
+        
+        imported = store.import_hashes(hashes)
+        if stored_algorithm is None:
+            store.set_meta('algorithm', imported_algorithm)
+        store.close()
+        
+        logger.success(f"Imported {imported} paths into {store.location}")
+    except Exception as e:
+        logger.error(f"Error importing hashes: {str(e)}")
+        if verbose:
+            import traceback
+            console.print(f"\n[dim]{traceback.format_exc()}[/dim]")
+
+@main.command()
+@click.option('--size-mb', type=click.IntRange(min=1), default=256, show_default=True,
+              help='Amount of data hashed per measurement, in MB.')
+@click.option('--algorithm', type=click.Choice(ALGORITHMS), default=DEFAULT_ALGORITHM, show_default=True,
+              help='Digest algorithm used to compare read methods.')
+@click.option('--entries', type=click.IntRange(min=1), default=100000, show_default=True,
+              help='Number of files in the catalog used to measure memory use.')
+@click.option('--filter-root', type=click.Path(exists=True, file_okay=False), default=None,
+              help='Also walk this directory to measure what pruning excluded subtrees saves.')
+@click.option('--exclude', multiple=True, metavar='PATTERN',
+              help='Exclude pattern used with --filter-root; can be repeated.')
+def benchmark(size_mb: int, algorithm: str, entries: int, filter_root: str, exclude: tuple):
+    """Measure hashing throughput of each digest algorithm and read method on this machine."""
+    
+    logger = SimpleLogger()
+    
+    try:
+        logger.info(f"Hashing {size_mb} MB of in-memory data per algorithm...")
+        results = Benchmark.algorithms(size_mb=size_mb)
+        
+        table = Table(title="Digest algorithms")
+        table.add_column("Algorithm", style="cyan")
+        table.add_column("MB/s", justify="right", style="green")
+        
+        for name, throughput in sorted(results.items(), key=lambda item: item[1], reverse=True):
+            table.add_row(name, f"{throughput:,.0f}")
+        
+        console.print(table)
+        
+        logger.info(f"Hashing a {size_mb} MB file with each read method...")
+        results = Benchmark.read_methods(size_mb=size_mb, algorithm=algorithm)
+        
+        table = Table(title=f"Read methods ({algorithm})")
+        table.add_column("Method", style="cyan")
+        table.add_column("MB/s", justify="right", style="green")
+        table.add_column("vs. read", justify="right")
+        
+        for method, throughput in results.items():
+            table.add_row(method, f"{throughput:,.0f}", f"{throughput / results['read']:.2f}x")
+        
+        console.print(table)
+        
+        logger.info(f"Building a catalog of {entries:,} files and loading it with full and interned paths...")
+        results = Benchmark.catalog_memory(entries=entries, algorithm=algorithm)
+        
+        table = Table(title=f"Catalog size ({algorithm}, {entries:,} files)")
+        table.add_column("Paths", style="cyan")
+        table.add_column("Memory (MB)", justify="right", style="green")
+        table.add_column("Pickle (MB)", justify="right", style="green")
+        
+        for layout, (heap, pickled) in results.items():
+            table.add_row(layout, f"{heap / 2**20:,.1f}", f"{pickled / 2**20:,.1f}")
+        table.add_row(
+            "saving",
+            f"{1 - results['directory table'][0] / results['full paths'][0]:.0%}",
+            f"{1 - results['directory table'][1] / results['full paths'][1]:.0%}",
+        )
+        
+        console.print(table)
+        
+        logger.info(f"Building a catalog of {entries:,} files with hex and with raw digests...")
+        results = Benchmark.digest_memory(entries=entries, algorithm=algorithm)
+        
+        table = Table(title=f"Digest size ({algorithm}, {entries:,} files)")
+        table.add_column("Digests", style="cyan")
+        table.add_column("Memory (MB)", justify="right", style="green")
+        table.add_column("Pickle (MB)", justify="right", style="green")
+        
+        for form, (heap, pickled) in results.items():
+            table.add_row(form, f"{heap / 2**20:,.1f}", f"{pickled / 2**20:,.1f}")
+        table.add_row(
+            "saving",
+            f"{1 - results['binary'][0] / results['hex'][0]:.0%}",
+            f"{1 - results['binary'][1] / results['hex'][1]:.0%}",
+        )
+        
+        console.print(table)
+        
+        if filter_root is not None:
+            logger.info(f"Walking {filter_root} with exclude patterns applied after the walk and during it...")
+            results = Benchmark.filter_pruning(filter_root, exclude=exclude)
+            
+            table = Table(title=f"Exclude patterns ({len(exclude)} on the command line)")
+            table.add_column("Filtering", style="cyan")
+            table.add_column("Directories listed", justify="right", style="green")
+            table.add_column("Entries stat'ed", justify="right", style="green")
+            table.add_column("Seconds", justify="right", style="green")
+            
+            for name, (listed, stated, elapsed) in results.items():
+                table.add_row(name, f"{listed:,}", f"{stated:,}", f"{elapsed:.2f}")
+            
+            console.print(table)
+            saved = (results['after walk'][0] - results['pruned'][0]) + (results['after walk'][1] - results['pruned'][1])
+            logger.info(f"Pruning saved {saved:,} directory listings and stat calls")
+    except Exception as e:
+        logger.error(f"Error running benchmark: {str(e)}")
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
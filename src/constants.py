@@ -5,5 +5,80 @@ Constants used across the duplicate files detector application.
 # Path to the pickle file storing hashes of files
 HASHES_PICKLE_PATH = "hashes.pickle"
 
-# Dictionary representing the empty state of the hashes pickle
-EMPTY_HASHES_PICKLE = {'files': {}, 'dirs': {}}
\ No newline at end of file
+# Path to the append-only journal of hashes recorded since the last snapshot
+HASHES_JOURNAL_PATH = "hashes.journal"
+
+# Minimum number of journal records between two snapshots of the hashes pickle.
+# The effective threshold grows with the catalog so snapshots stay amortized O(1).
+JOURNAL_CHECKPOINT_RECORDS = 10000
+
+# Maximum number of seconds a journal record may wait before a snapshot is taken
+JOURNAL_CHECKPOINT_SECONDS = 60
+
+# Dictionary representing the empty state of the hashes pickle.
+# Paths are interned: 'dir_table' lists a (parent_id, name) pair per directory, the list
+# index being the directory id, and files are keyed by (dir_id, name).
+# 'files' and 'dirs' map a raw digest to its group of file keys or directory ids: the bare
+# key for a group of one, otherwise a dict used as an ordered set.
+# 'records' maps a dir_id to the records of its files, {name: (hash, dev, ino, size, mtime_ns)};
+# the hash is None for a file skipped by the size prefilter, and the fingerprint fields
+# are None when unknown.
+# 'tree' maps a dir_id to its (hash, fingerprint, children), where children lists the
+# entry names of the directory, with a trailing '/' on subdirectories.
+# 'meta' holds catalog settings such as the digest algorithm.
+EMPTY_HASHES_PICKLE = {'dir_table': [], 'files': {}, 'dirs': {}, 'records': {}, 'tree': {}, 'meta': {}}
+
+# Path to the SQLite database storing hashes of files and directories
+HASHES_DB_PATH = "hashes.db"
+
+# Number of catalog writes grouped into a single SQLite transaction
+SQLITE_BATCH_SIZE = 1000
+
+# Available catalog backends and the one used when none is given
+BACKENDS = ('sqlite', 'pickle')
+DEFAULT_BACKEND = 'sqlite'
+
+# Number of bytes read from the head and from the tail of a file by the partial hash stages
+PARTIAL_HASH_SIZE = 4096
+
+# Number of batches (single files with threads) per hashing worker that may be hashed
+# or waiting in the pool, without being recorded, before the walker waits
+HASH_QUEUE_PER_JOB = 4
+
+# Number of threads re-stating catalogued paths when pruning, and the paths checked per task.
+# Stat calls mostly wait on the file system, so many more threads than cores pay off.
+PRUNE_JOBS = 16
+PRUNE_BATCH_SIZE = 512
+
+# Ways to treat symbolic links met while scanning, and the default. 'follow' hashes what a
+# link points to, 'record' hashes the link target path, and 'skip' leaves links out.
+SYMLINK_POLICIES = ('skip', 'follow', 'record')
+DEFAULT_SYMLINK_POLICY = 'follow'
+
+# Name of the per-directory file listing glob patterns to leave out of scans
+IGNORE_FILE_NAME = ".dupesignore"
+
+# Paths to the checkpoint of an interrupted process-dir run and to the files its size
+# prefilter selected, and the number of seconds between two checkpoints
+SCAN_STATE_PATH = "scan.state"
+SCAN_CANDIDATES_PATH = "scan.candidates"
+SCAN_CHECKPOINT_SECONDS = 30
+
+# Available hashing pools and the number of files sent to a process per task
+EXECUTORS = ('thread', 'process')
+HASH_BATCH_SIZE = 64
+
+# Digest algorithms a catalog can be built with, and the one used when none is given.
+# Catalogs created before the algorithm was recorded were built with SHA-256.
+ALGORITHMS = ('sha256', 'blake2b', 'sha1', 'md5')
+DEFAULT_ALGORITHM = 'sha256'
+
+# Size of the reusable buffer files are read into while hashing
+HASH_BUFFER_SIZE = 256 * 1024
+
+# Files at least this large are hashed through a read-only memory map
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# Ways hash_file can read a file; None picks one from the file size
+# ('read' is the original 64 KB chunked read, kept as a baseline for benchmarks)
+READ_METHODS = ('read', 'readall', 'readinto', 'file_digest', 'mmap')
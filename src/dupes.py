@@ -1,23 +1,165 @@
 import os
+import stat
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from src.files_helper import FilesHelper
 from src.hash_helper import HashHelper
+from src.hash_store import open_store, catalog_algorithm
+from src.file_table import FileTable
+from src.path_filter import PathFilter
+from src.scan_state import ScanState
 from src.logger import Logger
+from src.constants import DEFAULT_BACKEND
+from src.constants import DEFAULT_ALGORITHM
+from src.constants import HASH_QUEUE_PER_JOB
+from src.constants import HASH_BATCH_SIZE
+from src.constants import PRUNE_JOBS
+from src.constants import PRUNE_BATCH_SIZE
+from src.constants import DEFAULT_SYMLINK_POLICY
+from src.constants import SCAN_CHECKPOINT_SECONDS
 
 class Dupes:
-    def __init__(self, verbose: bool = False, logger: Logger = None):
-        self.hashes = HashHelper.load_hashes(verbose=verbose, logger=logger)
+    def __init__(
+        self,
+        verbose: bool = False,
+        logger: Logger = None,
+        backend: str = DEFAULT_BACKEND,
+        jobs: int = 1,
+        executor: str = 'thread',
+        algorithm: str = None,
+        trust_dir_mtime: bool = False,
+        symlinks: str = DEFAULT_SYMLINK_POLICY,
+        exclude: tuple = (),
+        include: tuple = (),
+        min_size: int = 0,
+        max_size: int = None,
+        one_file_system: bool = False,
+        scan_state: ScanState = None,
+    ):
+        """
+        Args:
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger (Logger, optional): Logger instance for logging messages.
+            backend (str, optional): Storage backend for the hash catalog.
+            jobs (int, optional): Number of workers reading and hashing files. With more
+                than one, files are hashed in a pool while the walk goes on, across
+                directories; results are still recorded on the calling thread. Defaults to 1.
+            executor (str, optional): 'thread' or 'process' pool for jobs > 1. Processes
+                receive files in batches of HASH_BATCH_SIZE, filled across directories.
+                Defaults to 'thread'.
+            algorithm (str, optional): Digest algorithm to hash with. Defaults to the one
+                the catalog was built with, or DEFAULT_ALGORITHM for a new catalog.
+            trust_dir_mtime (bool, optional): If True, the files of a directory whose mtime
+                is unchanged are assumed unchanged too, and their stored hashes are reused
+                without a stat call. Edits that rewrite a file in place do not change the
+                mtime of its directory and go unnoticed. Defaults to False.
+            symlinks (str, optional): What to do with symbolic links met while scanning:
+                'follow' them, 'record' the link itself by hashing its target path, or
+                'skip' them. Followed directories are tracked by device and inode, so a
+                link loop is skipped and a directory reached twice is only hashed once.
+                Defaults to DEFAULT_SYMLINK_POLICY.
+            exclude (tuple, optional): Glob patterns of files and directories to leave out,
+                on top of those of .dupesignore files. Excluded directories are not listed.
+            include (tuple, optional): Glob patterns of the files to hash. Defaults to all files.
+            min_size (int, optional): Files smaller than this many bytes are left out, without
+                being opened. Defaults to 0.
+            max_size (int, optional): Files larger than this many bytes are left out, without
+                being opened. Defaults to no limit.
+            one_file_system (bool, optional): If True, directories on another device than
+                the scan root, i.e. mount points, are not descended; they are listed in
+                self.skipped_mounts. Defaults to False.
+            scan_state (ScanState, optional): If given, the progress of directory scans is
+                checkpointed to it every SCAN_CHECKPOINT_SECONDS, and a scan of its first
+                root continues from its saved traversal stack. Defaults to None.
+        Raises:
+            ValueError: If the catalog was built with a different algorithm.
+        """
+        self.store = open_store(backend, verbose=verbose, logger=logger)
         self.logger = logger
+        
+        stored_algorithm = catalog_algorithm(self.store)
+        if algorithm is None:
+            algorithm = stored_algorithm or DEFAULT_ALGORITHM
+        elif stored_algorithm is None:
+            self.store.set_meta('algorithm', algorithm)
+        elif stored_algorithm != algorithm:
+            self.store.close()
+            raise ValueError(
+                f"The catalog was built with {stored_algorithm}, not {algorithm}; "
+                f"clear the hashes before switching algorithms"
+            )
+        self.algorithm = algorithm
+        # Digest of empty files, which are recorded without being opened
+        self._empty_hash = HashHelper.new_hash(algorithm).digest()
+        self.trust_dir_mtime = trust_dir_mtime
+        self.symlinks = symlinks
+        self.exclude = tuple(exclude)
+        self.include = tuple(include)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.one_file_system = one_file_system
+        self._root_device = None
+        self._root = None
+        self._real_root = None
+        
+        self.executor = None
+        self.batch_size = 1
+        if jobs > 1 and executor == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=jobs)
+            self.batch_size = HASH_BATCH_SIZE
+        elif jobs > 1:
+            self.executor = ThreadPoolExecutor(max_workers=jobs)
+        # Batches submitted but not recorded yet before the walker waits for the oldest
+        self._max_in_flight = jobs * HASH_QUEUE_PER_JOB
+        # Files waiting for the next batch, as (path, fingerprint, frame) triples
+        self._batch = []
+        # Batches submitted to the pool, oldest first, as (batch, future) pairs
+        self._in_flight = deque()
+        # Fully visited directories whose hash waits for queued files, in the order they closed
+        self._closing = deque()
+        self.hash_candidates = None
+        self.stage_stats = {}
+        self._listings = {}
+        self._links = {}
+        self._link_paths = {}
+        self._first_links = {}
+        # Hash of every directory hashed so far by (device, inode); None while it is
+        # open, its frame while it waits in self._closing
+        self._visited = {} if symlinks == 'follow' else None
+        if self._visited is not None and scan_state is not None and scan_state.visited is not None:
+            self._visited = scan_state.visited
+        self.scan_state = scan_state
+        self._state_saved = time.monotonic()
+        self._counted = set()
         self.file_count = 0
         self.dir_count = 0
         self.error_count = 0
+        self.reused_count = 0
+        self.reused_dir_count = 0
+        self.hardlink_count = 0
+        self.symlink_count = 0
+        self.loop_count = 0
+        self.special_count = 0
+        self.excluded_count = 0
+        self.size_skipped_count = 0
+        self.empty_count = 0
+        self.skipped_mounts = []
         self.skipped_items = []
 
-    def count_items(self, path: str) -> dict:
+    def count_items(self, path: str, size_groups: dict = None) -> dict:
         """
         Count the total number of files and directories to process.
         
+        When size_groups is given, the directory listings read here are also kept
+        (with their cached stat results) and consumed by reursive_hash, so the
+        hashing pass does not list any directory a second time. Only the first
+        link of a hardlinked file goes into size_groups; prefilter gives the
+        other links the same fate.
+        
         Args:
             path (str): The path to count from
+            size_groups (dict, optional): If given, every file path is added to it under its size
             
         Returns:
             dict: Dictionary with 'files' and 'dirs' counts
@@ -27,133 +169,1054 @@ class Dupes:
         try:
             if os.path.isfile(path):
                 counts['files'] = 1
+                if size_groups is not None:
+                    size_groups.setdefault(os.path.getsize(path), []).append(path)
                 return counts
             
-            for _, dirs, files in os.walk(path):
-                counts['files'] += len(files)
-                counts['dirs'] += len(dirs)
+            stats = os.stat(path)
+            root_device = stats.st_dev
+            real_root = os.path.realpath(path) if self.symlinks == 'follow' else None
+            stack = [(path, (stats.st_dev, stats.st_ino), PathFilter(path, self.exclude, self.include))]
+            while stack:
+                dir_path, inode, path_filter = stack.pop()
+                if self._visited is not None:
+                    if inode in self._counted:
+                        continue  # A link loop, or a directory already reached through another link
+                    self._counted.add(inode)
+                entries = FilesHelper.scan_dir(dir_path)
+                if entries is None:
+                    continue  # _open_dir lists it again and reports the error
+                if size_groups is not None:
+                    self._listings[dir_path] = entries
+                path_filter = path_filter.enter(dir_path, entries, logger=self.logger)
+                
+                subdirs = []
+                for entry in entries:
+                    try:
+                        if path_filter.skips(entry.path, entry.is_dir()):
+                            continue
+                        if entry.is_symlink() and self.symlinks != 'follow':
+                            continue
+                        if entry.is_file():
+                            if not self._size_wanted(entry.stat().st_size):
+                                continue
+                            counts['files'] += 1
+                            if size_groups is not None and not self._is_extra_link(entry.path, entry.stat()):
+                                size_groups.setdefault(entry.stat().st_size, []).append(entry.path)
+                        elif entry.is_dir():
+                            stats = entry.stat()
+                            if self.one_file_system and stats.st_dev != root_device:
+                                continue  # A mount point; _hash_tree reports it
+                            counts['dirs'] += 1
+                            dir_path = entry.path
+                            if entry.is_symlink():
+                                dir_path = self._real_dir_path(entry.path, path, real_root, path_filter)
+                            subdirs.append((dir_path, (stats.st_dev, stats.st_ino), path_filter, entry.is_symlink()))
+                    except OSError:
+                        continue
+                
+                # Visit subdirectories in the order of _hash_tree, so that a directory
+                # reachable through several links is first reached through the same one
+                subdirs.sort(key=lambda subdir: subdir[3])
+                stack.extend(subdir[:3] for subdir in reversed(subdirs))
         except (PermissionError, OSError) as e:
             if self.logger:
                 self.logger.warning(f"Cannot access path for counting: {path} - {str(e)}")
         
         return counts
 
-    def reursive_hash(self, path: str, verbose: bool = False, task_id: int = None) -> str:
+    def _is_extra_link(self, path: str, stats: os.stat_result) -> bool:
+        """
+        Check whether a file is a hardlink of a file already counted by count_items.
+
+        Args:
+            path (str): The path to the file.
+            stats (os.stat_result): The stat result of the file.
+        Returns:
+            bool: True if another link of the same inode was counted before.
+        """
+        if stats.st_nlink < 2:
+            return False
+
+        first = self._first_links.setdefault((stats.st_dev, stats.st_ino), path)
+        if first == path:
+            return False
+        self._link_paths.setdefault(first, []).append(path)
+        return True
+
+    def _cached_file_hash(self, path: str, fingerprint: tuple):
+        """
+        Return the stored hash of a file if its stat fingerprint is unchanged.
+
+        Args:
+            path (str): The path to the file.
+            fingerprint (tuple): The current stat fingerprint of the file.
+        Returns:
+            bytes: The stored hash, or None if the file has to be hashed again.
+        """
+        cached = self.store.get_file(path)
+        if cached is None or cached[1] != fingerprint:
+            return None
+
+        self.reused_count += 1
+        if self.logger:
+            self.logger.debug(f"Unchanged, reusing stored hash: {path}")
+        return cached[0]
+
+    def prefilter(self, size_groups: dict, verbose: bool = False) -> None:
+        """
+        Select the files that need a full hash, given the sizes of the files to process.
+
+        Files whose size is unique, here and in the catalog, are eliminated first.
+        The remaining same-size groups go through the head and tail block stages of
+        HashHelper.staged_filter; only their survivors are fully hashed later on.
+        Per-stage elimination counts are kept in self.stage_stats.
+
+        Args:
+            size_groups (dict): Maps a file size to the paths of the files with that size,
+                as filled by count_items.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+        """
+        self.hash_candidates = set()
+        self.stage_stats = {'size': 0, 'head': 0, 'tail': 0}
+
+        for size, paths in size_groups.items():
+            if size == 0:
+                continue  # Empty files all get the empty digest without being read; see _start_file
+            members = set(paths)
+            catalogued = [path for path in self.store.paths_with_size(size) if path not in members]
+            unhashed = [path for path, _ in self.store.unhashed_with_size(size) if path not in members]
+
+            if len(paths) + len(catalogued) < 2:
+                self.stage_stats['size'] += len(paths)
+                continue
+
+            if len(catalogued) > len(unhashed):
+                # Hashed catalog entries have no stored block hashes to compare against
+                self.hash_candidates.update(paths)
+                self._hash_unhashed(unhashed, verbose=verbose)
+                continue
+
+            survivors = HashHelper.staged_filter(
+                [paths + unhashed], size, stats=self.stage_stats, logger=self.logger,
+                algorithm=self.algorithm,
+            )
+            for group in survivors:
+                self.hash_candidates.update(path for path in group if path in members)
+                self._hash_unhashed([path for path in group if path not in members], verbose=verbose)
+
+        # The other links of a candidate are hashed too, or rather reuse its digest
+        for path, links in self._link_paths.items():
+            if path in self.hash_candidates:
+                self.hash_candidates.update(links)
+        self._link_paths = {}
+        self._first_links = {}
+
+    def _hash_unhashed(self, paths: list, verbose: bool = False) -> None:
+        """
+        Hash catalogued files that were skipped earlier, now that they may have a duplicate.
+
+        Args:
+            paths (list): Paths of files recorded as unhashed in the catalog.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+        """
+        for path in paths:
+            metadata = FilesHelper.get_file_metadata(path, verbose=verbose, logger=self.logger)
+            if metadata is None or not stat.S_ISREG(metadata['type']):
+                self.store.remove_unhashed(path)
+                continue
+            try:
+                file_hash = HashHelper.hash_file(
+                    path, verbose=verbose, logger=self.logger, algorithm=self.algorithm, size=metadata['size']
+                )
+                self.store.add_file(file_hash, path, FilesHelper.fingerprint(metadata))
+            except (PermissionError, OSError, IOError) as e:
+                if self.logger:
+                    self.logger.warning(f"Cannot read file, skipping: {path} - {str(e)}")
+
+    def _start_file(self, path: str, stats: os.stat_result) -> tuple:
+        """
+        Check whether a file has to be read, reusing the stored hash when it is unchanged.
+
+        Args:
+            path (str): The path to the file.
+            stats (os.stat_result): The stat result of the file, e.g. from a cached DirEntry.
+        Returns:
+            tuple: (file_hash, fingerprint). file_hash is None when the file has to be
+                hashed; it is a placeholder hash if the prefilter skipped the file.
+        """
+        fingerprint = FilesHelper.fingerprint(FilesHelper.metadata_from_stat(stats))
+
+        file_hash = self._cached_file_hash(path, fingerprint)
+        if stats.st_nlink > 1:
+            file_hash = self._link_hash(path, fingerprint, stats.st_nlink, file_hash)
+        if file_hash is not None:
+            return file_hash, None
+        
+        if stats.st_size == 0:
+            # All empty files are duplicates of each other; there is nothing to read
+            self.empty_count += 1
+            self.store.add_file(self._empty_hash, path, fingerprint)
+            return self._empty_hash, None
+
+        if self.hash_candidates is not None and path not in self.hash_candidates:
+            if self.logger:
+                self.logger.debug(f"No possible duplicate, not hashing: {path}")
+            self.store.add_unhashed(path, fingerprint)
+            return HashHelper.placeholder_hash(path, algorithm=self.algorithm), None
+
+        return None, fingerprint
+
+    def _link_hash(self, path: str, fingerprint: tuple, nlink: int, file_hash: bytes = None) -> bytes:
+        """
+        Share one digest between all the hardlinks of an inode.
+
+        The first link seen registers the inode; once it is hashed, later links
+        reuse its digest instead of reading the same data again. While the first
+        link is queued in the pool, _hash_tree parks later links on it instead of
+        queueing them too, and _remember_link records them. An inode is forgotten
+        when all its links have been seen and none is queued, so only inodes with
+        links still to come are kept in memory.
+
+        Args:
+            path (str): The path to the file.
+            fingerprint (tuple): The stat fingerprint of the file, identical for all its links.
+            nlink (int): The number of links to the inode.
+            file_hash (bytes, optional): The stored hash of the file, if it was unchanged.
+        Returns:
+            bytes: file_hash, or the digest of another link of the same inode, or None
+                if the file still has to be hashed.
+        """
+        link = self._links.get(fingerprint)
+        if link is None:
+            # [digest, links still to see, links parked while one is queued (None if none is)]
+            link = self._links[fingerprint] = [file_hash, nlink, None]
+        elif file_hash is None and link[0] is not None:
+            file_hash = link[0]
+            self.hardlink_count += 1
+            self.store.add_file(file_hash, path, fingerprint)
+            if self.logger:
+                self.logger.debug(f"Hardlink of a hashed file, reusing its hash: {path}")
+        elif link[0] is None:
+            link[0] = file_hash
+
+        link[1] -= 1
+        if link[1] <= 0 and link[2] is None:
+            del self._links[fingerprint]
+        return file_hash
+
+    def _remember_link(self, fingerprint: tuple, file_hash: bytes, task_id: int = None) -> None:
+        """
+        Record the digest of a freshly hashed file for its other hardlinks.
+
+        The links parked on the file while it was queued are recorded with it.
+
+        Args:
+            fingerprint (tuple): The stat fingerprint of the file.
+            file_hash (bytes): The digest of the file, or None if it could not be read.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        link = self._links.get(fingerprint)
+        if link is None:
+            return
+        if link[0] is None:
+            link[0] = file_hash
+        parked, link[2] = link[2] or [], None
+        if link[1] <= 0:
+            del self._links[fingerprint]
+        for path, frame in parked:
+            self._fill_link(path, fingerprint, link[0], frame, task_id)
+
+    def _fill_link(self, path: str, fingerprint: tuple, file_hash: bytes, frame: '_DirFrame', task_id: int = None) -> None:
+        """
+        Record a hardlink that was parked while another link of its inode was queued.
+
+        A link whose queued link could not be read is read itself.
+
+        Args:
+            path (str): The path to the link.
+            fingerprint (tuple): The stat fingerprint of the link.
+            file_hash (bytes): The digest of the queued link, or None if it could not be read.
+            frame (_DirFrame): The frame of the directory holding the link.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        frame.waiting -= 1
+        try:
+            if file_hash is None:
+                file_hash = HashHelper.hash_file(path, logger=self.logger, algorithm=self.algorithm, size=fingerprint[2])
+            else:
+                self.hardlink_count += 1
+                if self.logger:
+                    self.logger.debug(f"Hardlink of a hashed file, reusing its hash: {path}")
+        except (PermissionError, OSError, IOError) as e:
+            self._file_done(path, task_id, error=e)
+            return
+        self.store.add_file(file_hash, path, fingerprint)
+        frame.hashes.append(file_hash)
+        self._file_done(path, task_id)
+
+    def _queue_file(self, path: str, fingerprint: tuple, frame: '_DirFrame', task_id: int = None) -> None:
         """
-        Recursively hash a file or directory with comprehensive error handling.
+        Add a file to the batch being filled for the pool, and submit the batch once it is full.
+
+        The batch is shared by all directories, so small directories do not
+        each send a short batch.
+
+        Args:
+            path (str): The path to the file.
+            fingerprint (tuple): The stat fingerprint of the file, as returned by _start_file.
+            frame (_DirFrame): The frame of the directory holding the file.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        self._batch.append((path, fingerprint, frame))
+        if len(self._batch) >= self.batch_size:
+            self._submit_batch(task_id)
+
+    def _submit_batch(self, task_id: int = None) -> None:
+        """
+        Send the batch being filled, if any, to the pool, and record the batches it has finished.
+
+        Finished batches are recorded as the walk goes, not only when a
+        directory closes, so a large directory does not pile up hashed files.
+        Once self._max_in_flight batches are unrecorded, the walker waits for
+        the oldest, so it cannot run far ahead of the pool.
+
+        Args:
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        if not self._batch:
+            return
+        while len(self._in_flight) >= self._max_in_flight:
+            self._collect_batches(task_id, wait=True)
+        self._in_flight.append((self._batch, self._submit(self._batch)))
+        self._batch = []
+        self._collect_batches(task_id)
+
+    def _submit(self, batch: list):
+        """
+        Hash a batch of files in the pool.
+
+        Args:
+            batch (list): (path, fingerprint, frame) triples, as queued by _queue_file.
+        Returns:
+            Future: Resolves to the results of HashHelper.hash_files.
+        """
+        return self.executor.submit(
+            HashHelper.hash_files, [path for path, _, _ in batch], self.algorithm,
+            [fingerprint[2] for _, fingerprint, _ in batch],
+        )
+
+    def _finish_batch(self, batch: list, future, task_id: int = None) -> None:
+        """
+        Wait for a batch hashed in the pool and record its hashes in the directories holding the files.
+
+        Args:
+            batch (list): (path, fingerprint, frame) triples passed to _submit.
+            future: The future returned by _submit.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        try:
+            results = future.result()
+        except Exception as e:
+            # The whole batch is lost, e.g. when a worker process died
+            results = [(path, None, str(e)) for path, _, _ in batch]
+
+        for (path, fingerprint, frame), (_, file_hash, error) in zip(batch, results):
+            frame.waiting -= 1
+            if file_hash is None:
+                self._remember_link(fingerprint, None, task_id)
+                self._file_done(path, task_id, error=IOError(error))
+                continue
+            self.store.add_file(file_hash, path, fingerprint)
+            frame.hashes.append(file_hash)
+            self._file_done(path, task_id)
+            self._remember_link(fingerprint, file_hash, task_id)
+
+    def _collect_batches(self, task_id: int = None, wait: bool = False) -> None:
+        """
+        Record the batches the pool has finished, oldest first.
+
+        Args:
+            task_id (int, optional): Progress task ID for updating progress bar.
+            wait (bool, optional): If True, wait for the oldest batch if it is still being
+                hashed, and send the batch being filled if none is in the pool. Defaults to False.
+        """
+        if wait and not self._in_flight:
+            self._submit_batch(task_id)
+        while self._in_flight and (wait or self._in_flight[0][1].done()):
+            batch, future = self._in_flight.popleft()
+            self._finish_batch(batch, future, task_id)
+            wait = False
+
+    def _grow_progress(self, task_id: int, files: int) -> None:
+        """
+        Add newly discovered files to the progress total.
+
+        Args:
+            task_id (int): Progress task ID for updating progress bar.
+            files (int): Number of files discovered.
+        """
+        if self.logger and task_id is not None and hasattr(self.logger, 'grow_task'):
+            self.logger.grow_task(task_id, files)
+
+    def _file_done(self, path: str, task_id: int = None, error: Exception = None) -> None:
+        """
+        Account for a processed file and advance the progress bar.
+
+        Args:
+            path (str): The path to the file.
+            task_id (int, optional): Progress task ID for updating progress bar.
+            error (Exception, optional): The error that prevented hashing the file.
+        """
+        if error is not None:
+            if self.logger:
+                self.logger.warning(f"Cannot read file, skipping: {path} - {str(error)}")
+            self.error_count += 1
+            self.skipped_items.append(path)
+
+        # Advance even on errors so progress does not get stuck
+        self.file_count += 1
+        if self.logger and task_id is not None:
+            self.logger.update_task(task_id, advance=1)
+
+    def reursive_hash(self, path: str, verbose: bool = False, task_id: int = None) -> bytes:
+        """
+        Hash a file or a whole directory tree with comprehensive error handling.
+
+        Despite its name, directory trees are walked iteratively by _hash_tree,
+        so deep trees are not limited by the recursion limit.
 
         Args:
             path (str): The path to the file or directory.
             verbose (bool, optional): If True, print verbose output. Defaults to False.
             task_id (int, optional): Progress task ID for updating progress bar.
         Returns:
-            str: The hash of the file or directory, or None if an error occurred.
+            bytes: The hash of the file or directory, or None if an error occurred.
         """
         
         try:
-            if not os.path.exists(path):
-                if self.logger:
-                    self.logger.warning(f"Path does not exist, skipping: {path}")
-                self.error_count += 1
-                self.skipped_items.append(path)
-                return None
+            stats = os.stat(path)
+        except FileNotFoundError:
+            if self.logger:
+                self.logger.warning(f"Path does not exist, skipping: {path}")
+            self.error_count += 1
+            self.skipped_items.append(path)
+            return None
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Cannot access path, skipping: {path} - {str(e)}")
+            self.error_count += 1
+            self.skipped_items.append(path)
+            return None
+        
+        try:
+            if stat.S_ISREG(stats.st_mode):
+                self._grow_progress(task_id, 1)
+                return self._hash_one_file(path, stats, verbose=verbose, task_id=task_id)
+            if stat.S_ISDIR(stats.st_mode):
+                return self._hash_tree(path, stats, verbose=verbose, task_id=task_id)
+            if self.logger:
+                self.logger.warning(f"Not a regular file or directory, skipping: {path}")
+            self.special_count += 1
+            return None
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Unexpected error processing path, skipping: {path} - {str(e)}")
+            self.error_count += 1
+            self.skipped_items.append(path)
+            return None
+
+    def _leave_out(self, entry, frame: '_DirFrame', skipped: str, reason: str, task_id: int = None) -> None:
+        """
+        Leave out an entry on purpose: excluded by the patterns, outside the size limits or on another file system.
+
+        The entry stays in the directory listing kept in the catalog, so that a
+        later scan with other options can still reuse the listing. It adds a
+        placeholder hash unique to its path to the directory hash, like files
+        skipped by the size prefilter, so directories that only differ in what
+        was left out are not reported as duplicates of each other or of empty
+        directories.
+
+        Args:
+            entry: The os.DirEntry, or _CachedEntry, of the entry.
+            frame (_DirFrame): The frame of the directory holding the entry.
+            skipped (str): Name of the attribute accounting for the entry: a counter
+                to increment, or a list to append its path to.
+            reason (str): Why the entry is left out, for the debug log.
+            task_id (int, optional): Progress task ID, given for files counted in the
+                progress total.
+        """
+        if self.logger:
+            self.logger.debug(f"{reason}, skipping: {entry.path}")
+        if entry.is_symlink():
+            frame.fingerprint = None  # See the symlink handling in _hash_tree
+        else:
+            frame.children.append(entry.name + '/' if entry.is_dir() else entry.name)
+        tally = getattr(self, skipped)
+        if isinstance(tally, list):
+            tally.append(entry.path)
+        else:
+            setattr(self, skipped, tally + 1)
+        frame.hashes.append(HashHelper.placeholder_hash(entry.path, algorithm=self.algorithm))
+        if self.logger and task_id is not None:
+            self.logger.update_task(task_id, advance=1)
+
+    def _real_dir_path(self, path: str, root: str, real_root: str, path_filter: PathFilter) -> str:
+        """
+        Find the path under the scan root of the directory a followed symlink points to.
+
+        A linked directory inside the tree is walked under its own path, so it is
+        catalogued where it really is, whichever path reaches it first; the link
+        and the real path then share its hash.
+
+        Args:
+            path (str): The path to the symbolic link.
+            root (str): The scan root, as given.
+            real_root (str): The scan root with symbolic links resolved.
+            path_filter (PathFilter): The filter of the directory holding the link.
+        Returns:
+            str: The path of the target under root, or path if the target is outside
+                the scan root or excluded.
+        """
+        real_path = os.path.realpath(path)
+        if not real_path.startswith(real_root.rstrip(os.sep) + os.sep):
+            return path
+        target = os.path.join(root, os.path.relpath(real_path, real_root))
+        return path if path_filter.skips(target, True) else target
+
+    def _size_wanted(self, size: int) -> bool:
+        """Check whether a file of the given size is within --min-size and --max-size."""
+        return size >= self.min_size and (self.max_size is None or size <= self.max_size)
+
+    def _skip_special(self, path: str, frame: '_DirFrame') -> None:
+        """
+        Leave out an entry that is neither a regular file nor a directory.
+
+        FIFOs, sockets and device nodes are never opened: reading a FIFO or a
+        device can block forever.
+
+        Args:
+            path (str): The path to the entry.
+            frame (_DirFrame): The frame of the directory holding the entry.
+        """
+        if self.logger:
+            self.logger.debug(f"Not a regular file or directory, skipping: {path}")
+        self.special_count += 1
+        frame.size -= 1  # Left out on purpose; not missing content
+
+    def _hash_one_file(self, path: str, stats: os.stat_result, verbose: bool = False, task_id: int = None) -> bytes:
+        """
+        Hash a single file on the calling thread and record it.
+
+        Args:
+            path (str): The path to the file.
+            stats (os.stat_result): The stat result of the file, e.g. from a cached DirEntry.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        Returns:
+            bytes: The hash of the file, or None if it could not be read.
+        """
+        if self.logger:
+            self.logger.debug(f"Hashing file: {path}")
+        
+        try:
+            file_hash, fingerprint = self._start_file(path, stats)
+            if file_hash is None:
+                file_hash = HashHelper.hash_file(
+                    path, verbose=verbose, logger=self.logger, algorithm=self.algorithm, size=stats.st_size
+                )
+                self.store.add_file(file_hash, path, fingerprint)
+                self._remember_link(fingerprint, file_hash, task_id)
             
-            if os.path.isfile(path):
-                if self.logger:
-                    self.logger.debug(f"Hashing file: {path}")
-                
-                try:
-                    file_hash = HashHelper.hash_file(path, verbose=verbose, logger=self.logger)
-                    
-                    if file_hash in self.hashes['files']:
-                        if path not in self.hashes['files'][file_hash]:
-                            self.hashes['files'][file_hash].append(path)
-                    else:
-                        self.hashes['files'][file_hash] = [path]
-                    
-                    HashHelper.save_hashes(self.hashes, verbose=verbose, logger=self.logger)
-                    
-                    # Update progress
-                    self.file_count += 1
-                    if self.logger and task_id is not None:
-                        self.logger.update_task(task_id, advance=1)
-                    
-                    return file_hash
-                    
-                except (PermissionError, OSError, IOError) as e:
-                    if self.logger:
-                        self.logger.warning(f"Cannot read file, skipping: {path} - {str(e)}")
-                    self.error_count += 1
-                    self.skipped_items.append(path)
-                    
-                    # Still advance progress to not get stuck
-                    self.file_count += 1
-                    if self.logger and task_id is not None:
-                        self.logger.update_task(task_id, advance=1)
-                    
-                    return None
+            self._file_done(path, task_id)
+            return file_hash
             
-            contents_hashes = []
+        except (PermissionError, OSError, IOError) as e:
+            self._file_done(path, task_id, error=e)
+            return None
 
-            if self.logger:
-                self.logger.debug(f"Hashing directory: {path}")
+    def _hash_tree(self, root: str, stats: os.stat_result, verbose: bool = False, task_id: int = None) -> bytes:
+        """
+        Hash a directory tree bottom-up with an explicit stack.
+
+        Each stack frame holds the entries of a directory that are still to be
+        visited and the hashes of its children visited so far. Entries are dropped
+        as they are consumed, and a directory is hashed (post-order) as soon as its
+        last entry is done, giving the same digests as HashHelper.hash_list over
+        the children. Directory entries come from os.scandir, and the file type and
+        stat result cached on each entry are reused, so every entry costs at most
+        one stat call. Only regular files are hashed and only directories are
+        descended; FIFOs, sockets and device nodes are skipped and counted.
+        Entries left out by the include and exclude patterns are skipped before
+        anything else, so excluded directories are never listed. With
+        one_file_system, directories on another device than the root are not
+        descended either.
+
+        The catalog keeps the listing of every directory (a Merkle tree over the
+        stored hashes). A directory whose mtime is unchanged is not listed again,
+        and a directory whose hash is unchanged is not written again, so on a
+        rescan only the ancestors of changed entries are updated.
+
+        Symbolic links are handled according to self.symlinks. When they are
+        followed, a directory that is still open further up the stack is a link
+        loop and is skipped, and a directory already hashed contributes its hash
+        without being walked again. Links come last in each listing, and a linked
+        directory inside the tree is walked under its real path, so the catalog
+        records it there.
+
+        With a pool, files are queued in batches shared by all directories. A
+        directory whose files are still being hashed when its last entry is
+        visited waits in a queue of closed directories instead of holding up the
+        walk, so the pool keeps receiving files. Closed directories are hashed
+        in the order they closed, so each one after its subdirectories.
+
+        Args:
+            root (str): The path to the directory.
+            stats (os.stat_result): The stat result of the directory.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        Returns:
+            bytes: The hash of the directory, or None if an error occurred.
+        """
+        if self._visited:
+            root_hash = self._visited.get((stats.st_dev, stats.st_ino))
+            if root_hash is not None:
+                return root_hash or None  # Already hashed through another path in this scan
+        
+        self._root_device = stats.st_dev
+        self._root = root
+        self._real_root = os.path.realpath(root) if self.symlinks == 'follow' else None
+        if self.scan_state is not None and self.scan_state.stack and self.scan_state.roots[:1] == [root]:
+            # Continue an interrupted scan where its last checkpoint left off
+            stack = [self._restore_frame(saved, task_id=task_id) for saved in self.scan_state.stack]
+            for parent, frame in zip(stack, stack[1:]):
+                frame.parent = parent
+            self.scan_state.stack = None
+        else:
+            root_filter = PathFilter(root, self.exclude, self.include)
+            frame = self._open_dir(root, stats, root_filter, verbose=verbose, task_id=task_id)
+            if frame is None:
+                return None
+            stack = [frame]
+        root_frame = stack[0]
+        # Left over by a tree whose walk failed; nothing waits for them any more
+        self._batch = []
+        self._in_flight.clear()
+        self._closing.clear()
+        
+        while stack:
+            if self.scan_state is not None and time.monotonic() - self._state_saved >= SCAN_CHECKPOINT_SECONDS:
+                self._save_scan_state(stack, task_id=task_id)
+            
+            frame = stack[-1]
+            
+            if not frame.entries:
+                stack.pop()
+                self._close_dir(frame, task_id=task_id)
+                continue
+            
+            entry = frame.entries.popleft()
             
             try:
-                contents = FilesHelper.get_dir_contents(path, verbose=verbose, logger=self.logger)
+                if frame.filter.skips(entry.path, entry.is_dir()):
+                    self._leave_out(entry, frame, 'excluded_count', "Excluded")
+                    continue
                 
-                for item in contents:
+                if entry.is_symlink():
+                    # The target of a link can change without its directory changing, and
+                    # a skipped link is missing from the listing a later run with another
+                    # policy would reuse, so directories holding links do not keep their
+                    # listing (see _close_dir)
+                    frame.fingerprint = None
+                    if self.symlinks == 'skip':
+                        self.symlink_count += 1
+                        frame.size -= 1  # Left out on purpose; not missing content
+                        continue
+                    if self.symlinks == 'record':
+                        frame.children.append(entry.name)
+                        frame.hashes.append(HashHelper.hash_symlink(entry.path, algorithm=self.algorithm))
+                        self.symlink_count += 1
+                        continue
                     try:
-                        item_hash = self.reursive_hash(item, verbose=verbose, task_id=task_id)
-                        if item_hash is not None:  # Only include successfully hashed items
-                            contents_hashes.append(item_hash)
-                    except Exception as e:
-                        if self.logger:
-                            self.logger.warning(f"Error processing item, skipping: {item} - {str(e)}")
-                        self.error_count += 1
-                        self.skipped_items.append(item)
+                        entry.stat()  # Cached on the entry and reused below
+                    except FileNotFoundError:
+                        frame.size -= 1  # Dangling symlinks have nothing to hash
                         continue
                 
-                if self.logger:
-                    self.logger.debug(f"Computed hashes for directory: {path}")
-
-                # Only hash directory if we successfully got at least some content
-                if contents_hashes or len(contents) == 0:
-                    dir_hash = HashHelper.hash_list(contents_hashes, verbose=verbose, logger=self.logger)
-                    
-                    if dir_hash in self.hashes['dirs']:
-                        if path not in self.hashes['dirs'][dir_hash]:
-                            self.hashes['dirs'][dir_hash].append(path)
-                    else:
-                        self.hashes['dirs'][dir_hash] = [path]
-                    
-                    HashHelper.save_hashes(self.hashes, verbose=verbose, logger=self.logger)
-                    
-                    self.dir_count += 1
-                    if self.logger and task_id is not None:
-                        self.logger.update_task(task_id, advance=0)  # Don't advance, just refresh
-                    
-                    return dir_hash
+                if entry.is_dir():
+                    dir_stats = entry.stat()
+                    if self.one_file_system and dir_stats.st_dev != self._root_device:
+                        self._leave_out(entry, frame, 'skipped_mounts', "On another file system")
+                        continue
+                    inode = (dir_stats.st_dev, dir_stats.st_ino)
+                    if self._visited is not None and inode in self._visited:
+                        visited = self._visited[inode]
+                        if isinstance(visited, _DirFrame):
+                            # Closed, but still waiting for its files; its hash is needed now
+                            self._finish_closed(task_id, wait=True, until=visited)
+                            visited = self._visited[inode]
+                        if visited is None:
+                            if self.logger:
+                                self.logger.warning(f"Symlink loop, skipping: {entry.path}")
+                            self.loop_count += 1
+                            frame.size -= 1
+                            continue
+                        # Already walked through another path; False if it had no valid content
+                        frame.children.append(entry.name + '/')
+                        if visited:
+                            frame.hashes.append(visited)
+                        continue
+                    frame.children.append(entry.name + '/')
+                    dir_path = entry.path
+                    if entry.is_symlink():
+                        dir_path = self._real_dir_path(entry.path, self._root, self._real_root, frame.filter)
+                    child = self._open_dir(dir_path, dir_stats, frame.filter, verbose=verbose, task_id=task_id)
+                    if child is not None:
+                        child.parent = frame
+                        stack.append(child)
+                    continue
+                
+                if not entry.is_file():
+                    self._skip_special(entry.path, frame)
+                    continue
+                
+                if frame.trusted:
+                    cached = self.store.get_file(entry.path)
+                    if cached is not None and not self._size_wanted(cached[1][2]):
+                        self._leave_out(entry, frame, 'size_skipped_count', "Outside the size limits", task_id)
+                        continue
+                    if cached is not None:
+                        self.reused_count += 1
+                        frame.children.append(entry.name)
+                        frame.hashes.append(cached[0])
+                        self._file_done(entry.path, task_id)
+                        continue
+                
+                # Listings taken from the catalog only know files from directories, so
+                # check the stat result before anything opens the file
+                file_stats = entry.stat()
+                if not stat.S_ISREG(file_stats.st_mode):
+                    self._skip_special(entry.path, frame)
+                    continue
+                if not self._size_wanted(file_stats.st_size):
+                    self._leave_out(entry, frame, 'size_skipped_count', "Outside the size limits", task_id)
+                    continue
+                frame.children.append(entry.name)
+                
+                if self.executor is None:
+                    file_hash = self._hash_one_file(entry.path, file_stats, verbose=verbose, task_id=task_id)
                 else:
-                    if self.logger:
-                        self.logger.warning(f"No valid content found in directory, skipping hash: {path}")
-                    self.error_count += 1
-                    self.skipped_items.append(path)
-                    return None
-                    
-            except (PermissionError, OSError) as e:
+                    # Queue the file and keep walking; its hash is recorded in the frame once read
+                    file_hash, fingerprint = self._start_file(entry.path, file_stats)
+                    if file_hash is None:
+                        frame.waiting += 1
+                        link = self._links.get(fingerprint) if file_stats.st_nlink > 1 else None
+                        if link is not None and link[2] is not None:
+                            # Another link of the inode is queued; take its digest when it is hashed
+                            link[2].append((entry.path, frame))
+                            continue
+                        if link is not None:
+                            link[2] = []
+                        self._queue_file(entry.path, fingerprint, frame, task_id)
+                        continue
+                    self._file_done(entry.path, task_id)
+                
+                if file_hash is not None:  # Only include successfully hashed items
+                    frame.hashes.append(file_hash)
+            except Exception as e:
                 if self.logger:
-                    self.logger.warning(f"Cannot access directory, skipping: {path} - {str(e)}")
+                    self.logger.warning(f"Error processing item, skipping: {entry.path} - {str(e)}")
+                self.error_count += 1
+                self.skipped_items.append(entry.path)
+        
+        self._drain(task_id)
+        return root_frame.digest
+
+    def _open_dir(
+        self, path: str, stats: os.stat_result, path_filter: PathFilter, verbose: bool = False, task_id: int = None
+    ) -> '_DirFrame':
+        """
+        List a directory and build its traversal frame.
+
+        If the directory's fingerprint matches the stored one, its listing is taken
+        from the catalog instead of being read again. A directory that cannot be
+        listed is counted as an error and gets no frame, so nothing is recorded
+        for it and the next scan lists it again.
+
+        Args:
+            path (str): The path to the directory.
+            stats (os.stat_result): The stat result of the directory, taken before it is listed.
+            path_filter (PathFilter): The filter of the parent directory, or of the scan root.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        Returns:
+            _DirFrame: The frame holding the entries of the directory, or None if it
+                cannot be listed.
+        """
+        if self.logger:
+            self.logger.debug(f"Hashing directory: {path}")
+        
+        fingerprint = FilesHelper.dir_fingerprint(stats)
+        stored = self.store.get_dir(path)
+        unchanged = stored is not None and stored[1] == fingerprint
+        
+        entries = self._listings.pop(path, None)
+        if entries is None and unchanged:
+            entries = [_CachedEntry(path, child) for child in stored[2]]
+        elif entries is None:
+            entries = FilesHelper.scan_dir(path, verbose=verbose, logger=self.logger)
+            if entries is None:
                 self.error_count += 1
                 self.skipped_items.append(path)
                 return None
-                
-        except Exception as e:
+        if self.symlinks == 'follow':
+            # Real entries first, so a directory also reached through a link is walked under its own path
+            entries = sorted(entries, key=lambda entry: entry.is_symlink())
+        path_filter = path_filter.enter(path, entries, verbose=verbose, logger=self.logger)
+        self._grow_progress(task_id, self._files_to_visit(entries, path_filter))
+        
+        frame = _DirFrame(path, entries)
+        frame.filter = path_filter
+        frame.fingerprint = fingerprint
+        frame.stored = stored
+        frame.trusted = unchanged and self.trust_dir_mtime
+        frame.inode = (stats.st_dev, stats.st_ino)
+        if self._visited is not None:
+            self._visited[frame.inode] = None
+        return frame
+
+    def _close_dir(self, frame: '_DirFrame', task_id: int = None) -> None:
+        """
+        Queue a fully visited directory, to be hashed once its queued files are recorded.
+
+        Args:
+            frame (_DirFrame): The frame of the directory.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        self._closing.append(frame)
+        if self._visited is not None:
+            self._visited[frame.inode] = frame
+        self._finish_closed(task_id)
+
+    def _finish_closed(self, task_id: int = None, wait: bool = False, until: '_DirFrame' = None) -> None:
+        """
+        Hash the closed directories whose files are all recorded, in the order they closed.
+
+        A directory closes after its subdirectories, so a directory still
+        waiting for its files also holds up the directories above it.
+
+        Args:
+            task_id (int, optional): Progress task ID for updating progress bar.
+            wait (bool, optional): If True, wait for the pool until every closed directory
+                is hashed, or until is. Defaults to False.
+            until (_DirFrame, optional): A closed directory to stop after.
+        """
+        self._collect_batches(task_id)
+        while self._closing:
+            frame = self._closing[0]
+            if frame.waiting:
+                if not wait:
+                    return
+                self._collect_batches(task_id, wait=True)
+                continue
+            self._closing.popleft()
+            self._hash_dir(frame, task_id)
+            if frame is until:
+                return
+
+    def _hash_dir(self, frame: '_DirFrame', task_id: int = None) -> None:
+        """
+        Hash a closed directory whose files are all recorded, and add the hash to its parent.
+
+        Args:
+            frame (_DirFrame): The frame of the directory.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        if self.logger:
+            self.logger.debug(f"Computed hashes for directory: {frame.path}")
+        
+        # Only hash directory if we successfully got at least some content
+        if not frame.hashes and frame.size > 0:
             if self.logger:
-                self.logger.error(f"Unexpected error processing path, skipping: {path} - {str(e)}")
+                self.logger.warning(f"No valid content found in directory, skipping hash: {frame.path}")
             self.error_count += 1
-            self.skipped_items.append(path)
-            return None
+            self.skipped_items.append(frame.path)
+            if self._visited is not None:
+                self._visited[frame.inode] = False
+            return
+        
+        dir_hash = HashHelper.hash_list(frame.hashes, logger=self.logger, algorithm=self.algorithm)
+        children = tuple(frame.children)
+        if frame.stored == (dir_hash, frame.fingerprint, children):
+            self.reused_dir_count += 1  # Nothing below changed; keep the stored record
+        else:
+            self._forget_removed(frame, children)
+            self.store.add_dir(dir_hash, frame.path, frame.fingerprint, children)
+        
+        frame.digest = dir_hash
+        if frame.parent is not None:
+            frame.parent.hashes.append(dir_hash)
+        if self._visited is not None:
+            self._visited[frame.inode] = dir_hash
+        self.dir_count += 1
+        if self.logger and task_id is not None:
+            self.logger.update_task(task_id, advance=0)  # Don't advance, just refresh
     
+    def _forget_removed(self, frame: '_DirFrame', children: tuple) -> None:
+        """
+        Remove from the catalog the entries of a directory that are gone since its last scan.
+
+        The stored listing of the directory is compared with the new one. A
+        removed directory is forgotten with everything below it that the catalog
+        holds a listing for, so its files stop showing up as duplicates.
+
+        Args:
+            frame (_DirFrame): The frame of the directory.
+            children (tuple): The new listing of the directory.
+        """
+        if frame.stored is None or frame.stored[2] == children:
+            return
+        names = {child.rstrip('/') for child in children}
+        gone = [(frame.path, child) for child in frame.stored[2] if child.rstrip('/') not in names]
+        
+        while gone:
+            dir_path, child = gone.pop()
+            path = os.path.join(dir_path, child.rstrip('/'))
+            if child.endswith('/'):
+                stored = self.store.get_dir(path)
+                if stored is not None:
+                    gone.extend((path, grandchild) for grandchild in stored[2])
+            if self.logger:
+                self.logger.debug(f"No longer exists, forgetting: {path}")
+            self.store.remove_path(path)
+
+    def _drain(self, task_id: int = None) -> None:
+        """
+        Wait for every file queued in the pool and hash every closed directory.
+
+        Args:
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        self._submit_batch(task_id)
+        while self._in_flight:
+            self._collect_batches(task_id, wait=True)
+        self._finish_closed(task_id)
+
+    def _save_scan_state(self, stack: list, task_id: int = None) -> None:
+        """
+        Checkpoint the traversal stack of the scan in progress to self.scan_state.
+
+        Files queued in the pool, and the hardlinks parked on them, are recorded
+        and the closed directories hashed first, and the catalog is flushed
+        before the state is written, so every entry the checkpoint counts as
+        visited has its hash recorded for good.
+
+        Args:
+            stack (list): The _DirFrame stack of _hash_tree.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        """
+        self._drain(task_id)
+        
+        if self.store.flush():
+            self.scan_state.stack = [frame.save() for frame in stack]
+            self.scan_state.visited = self._visited
+            self.scan_state.save(logger=self.logger)
+            self.scan_state.stack = None
+        self._state_saved = time.monotonic()
+
+    def _restore_frame(self, saved: tuple, task_id: int = None) -> '_DirFrame':
+        """
+        Rebuild a traversal frame saved by a scan checkpoint.
+
+        Args:
+            saved (tuple): The frame, as returned by _DirFrame.save.
+            task_id (int, optional): Progress task ID for updating progress bar.
+        Returns:
+            _DirFrame: The frame, with the entries that were still to be visited.
+        """
+        path, entries, size, hashes, children, fingerprint, trusted, inode, path_filter = saved
+        frame = _DirFrame(path, [
+            _CachedEntry(path, name + '/' if is_dir else name, is_symlink) for name, is_dir, is_symlink in entries
+        ])
+        frame.size = size
+        frame.hashes = hashes
+        frame.children = children
+        frame.fingerprint = fingerprint
+        frame.stored = self.store.get_dir(path)
+        frame.trusted = trusted
+        frame.inode = inode
+        frame.filter = path_filter
+        self._grow_progress(task_id, self._files_to_visit(frame.entries, path_filter))
+        return frame
+
+    def _files_to_visit(self, entries, path_filter: PathFilter) -> int:
+        """
+        Count the entries of a listing that advance the progress bar once visited.
+
+        Args:
+            entries: The os.DirEntry, or _CachedEntry, objects of a directory.
+            path_filter (PathFilter): The filter of the directory.
+        Returns:
+            int: The number of files, leaving out excluded files and, unless they are
+                followed, symbolic links.
+        """
+        follow = self.symlinks == 'follow'
+        return sum(
+            1 for entry in entries
+            if entry.is_file() and (follow or not entry.is_symlink()) and not path_filter.skips(entry.path, False)
+        )
+
+    def finish_root(self, root: str) -> None:
+        """
+        Record in self.scan_state that a directory given to process-dir is fully scanned.
+
+        Args:
+            root (str): The directory, as passed to reursive_hash.
+        """
+        if self.scan_state is None:
+            return
+        if self.scan_state.roots[:1] == [root]:
+            self.scan_state.roots.pop(0)
+        self.scan_state.stack = None
+        if self.store.flush():
+            self.scan_state.visited = self._visited
+            self.scan_state.save(logger=self.logger)
+        self._state_saved = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Stop the hashing pool and flush recorded hashes to persistent storage.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.store.close()
+
+    def prune(self, jobs: int = PRUNE_JOBS) -> tuple:
+        """
+        Remove catalog entries whose path vanished or changed since it was recorded.
+
+        Every catalogued path is stat'ed again, in batches spread over a thread
+        pool; the stale entries are then removed on the calling thread.
+
+        Args:
+            jobs (int, optional): Number of threads checking paths. Defaults to PRUNE_JOBS.
+        Returns:
+            tuple: (checked, removed) numbers of entries.
+        """
+        entries = self.store.entries()
+        batches = [entries[i:i + PRUNE_BATCH_SIZE] for i in range(0, len(entries), PRUNE_BATCH_SIZE)]
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            stale = [path for paths in pool.map(FilesHelper.stale_entries, batches) for path in paths]
+
+        for path in stale:
+            if self.logger:
+                self.logger.debug(f"Pruning stale entry: {path}")
+            self.store.remove_path(path)
+
+        return len(entries), len(stale)
+
     def detect_duplicates(self, verbose: bool = False) -> dict:
         """
         Detect duplicate files and directories based on their hashes.
@@ -161,19 +1224,35 @@ class Dupes:
         Args:
             verbose (bool, optional): If True, print verbose output. Defaults to False.
         Returns:
-            dict: A dictionary with duplicate files and directories.
+            dict: A dictionary with duplicate files and directories. File groups are
+                ordered by the bytes they would free, largest first; 'sizes' maps each
+                file group's hash to the size of one copy (-1 if unknown), 'links' to the
+                paths in the group that are hardlinks of an earlier path, and
+                'reclaimable' holds the total bytes freed by keeping one copy per group.
+                Hardlinks already share their storage and free nothing; groups made of
+                the links of a single file are left out.
         """
 
-        duplicates = {'files': {}, 'dirs': {}}
+        duplicates = {'files': {}, 'dirs': {}, 'sizes': {}, 'links': {}, 'reclaimable': 0}
 
         try:
-            for hash_value, paths in self.hashes['files'].items():
-                if len(paths) > 1:
-                    duplicates['files'][hash_value] = paths
+            digest_size = HashHelper.new_hash(self.algorithm).digest_size
+            table = FileTable.from_rows(self.store.duplicate_files(), digest_size)
+            groups = table.groups()
+            link_owners, link_ids = table.links(groups)
+            links = set(link_ids)
+            for group, reclaimable in table.by_size(groups, table.reclaimable(groups, link_owners)):
+                group_links = {table.paths[path_id] for path_id in group if path_id in links}
+                if len(group) - len(group_links) < 2:
+                    continue  # All links of a single file; nothing is duplicated
+                hash_value = table.digest(group[0])
+                duplicates['files'][hash_value] = [table.paths[path_id] for path_id in group]
+                duplicates['sizes'][hash_value] = table.sizes[group[0]]
+                duplicates['links'][hash_value] = group_links
+                duplicates['reclaimable'] += reclaimable
             
-            for hash_value, paths in self.hashes['dirs'].items():
-                if len(paths) > 1:
-                    duplicates['dirs'][hash_value] = paths
+            for hash_value, paths in self.store.duplicates('dirs'):
+                duplicates['dirs'][hash_value] = paths
             
             if self.logger:
                 self.logger.info(
@@ -184,4 +1263,72 @@ class Dupes:
             if self.logger:
                 self.logger.error(f"Error detecting duplicates: {str(e)}")
         
-        return duplicates
\ No newline at end of file
+        return duplicates
+
+class _DirFrame:
+    """
+    Traversal state of one directory on the _hash_tree stack.
+    """
+
+    __slots__ = (
+        'path', 'entries', 'size', 'hashes', 'waiting', 'parent', 'digest',
+        'children', 'fingerprint', 'stored', 'trusted', 'inode', 'filter',
+    )
+
+    def __init__(self, path: str, entries: list):
+        self.path = path
+        self.entries = deque(entries)
+        self.size = len(entries)
+        self.hashes = []
+        self.waiting = 0
+        self.parent = None
+        self.digest = None
+        self.children = []
+        self.fingerprint = None
+        self.stored = None
+        self.trusted = False
+        self.inode = None
+        self.filter = None
+
+    def save(self) -> tuple:
+        """
+        Capture the frame for a scan checkpoint, once its queued files and parked links are recorded.
+
+        Returns:
+            tuple: The state restored by Dupes._restore_frame.
+        """
+        entries = [(entry.name, entry.is_dir(), entry.is_symlink()) for entry in self.entries]
+        return (
+            self.path, entries, self.size, list(self.hashes), list(self.children),
+            self.fingerprint, self.trusted, self.inode, self.filter,
+        )
+
+class _CachedEntry:
+    """
+    Stand-in for an os.DirEntry, built from a directory listing stored in the catalog
+    or from the entries saved by a scan checkpoint.
+    """
+
+    __slots__ = ('name', 'path', '_is_dir', '_is_symlink', '_stat')
+
+    def __init__(self, dir_path: str, child: str, is_symlink: bool = False):
+        self._is_dir = child.endswith('/')
+        self._is_symlink = is_symlink
+        self.name = child[:-1] if self._is_dir else child
+        self.path = os.path.join(dir_path, self.name)
+        self._stat = None
+
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    def is_file(self) -> bool:
+        return not self._is_dir
+
+    def is_symlink(self) -> bool:
+        # Directories holding symlinks do not keep their listing; only checkpoints have them
+        return self._is_symlink
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
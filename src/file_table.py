@@ -0,0 +1,205 @@
+import array
+import itertools
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array module covers the same operations
+    np = None
+
+class FileTable:
+    """
+    A columnar table of catalogued files.
+
+    Every field is kept in its own typed array and the digests are packed back
+    to back in a single bytearray, so a row costs a few dozen bytes instead of
+    a Python object per field. The row number is the path id. Grouping by
+    digest, finding hardlinks, sorting by size and summing reclaimable bytes
+    run as vectorized NumPy operations over all groups at once when NumPy is
+    installed, and as loops over the arrays otherwise.
+    """
+
+    def __init__(self, digest_size: int):
+        """
+        Args:
+            digest_size (int): Length in bytes of the digests stored in the table.
+        """
+        self.digest_size = digest_size
+        self.paths = []
+        self.sizes = array.array('q')
+        self.mtimes = array.array('q')
+        self.inodes = array.array('Q')
+        self.devices = array.array('Q')
+        self.digests = bytearray()
+
+    @staticmethod
+    def from_rows(rows, digest_size: int) -> 'FileTable':
+        """
+        Build a table from (path, digest, fingerprint) rows, e.g. from a store.
+
+        Args:
+            rows: Iterable of (path, digest, fingerprint) tuples.
+            digest_size (int): Length in bytes of the digests.
+        Returns:
+            FileTable: The filled table.
+        """
+        table = FileTable(digest_size)
+        for path, digest, fingerprint in rows:
+            table.append(path, digest, fingerprint)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def append(self, path: str, digest: bytes, fingerprint: Optional[tuple] = None) -> int:
+        """
+        Add a file to the table.
+
+        Args:
+            path (str): The path to the file.
+            digest (bytes): The raw digest of the file.
+            fingerprint (tuple, optional): The (device, inode, size, mtime_ns) of the file.
+                Files without one get a size of -1, which counts as unknown.
+        Returns:
+            int: The path id of the new row.
+        Raises:
+            ValueError: If the digest does not have the table's digest size.
+        """
+        if len(digest) != self.digest_size:
+            raise ValueError(f"Expected a {self.digest_size} byte digest, got {len(digest)} bytes")
+
+        device, inode, size, mtime_ns = fingerprint if fingerprint is not None else (0, 0, -1, 0)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.mtimes.append(mtime_ns)
+        self.inodes.append(inode)
+        self.devices.append(device)
+        self.digests += digest
+        return len(self.paths) - 1
+
+    def digest(self, path_id: int) -> bytes:
+        """Return the digest of a row."""
+        start = path_id * self.digest_size
+        return bytes(self.digests[start:start + self.digest_size])
+
+    def groups(self) -> list:
+        """
+        Group the rows that share a digest.
+
+        Returns:
+            list: A list of path ids per digest shared by at least two rows, ordered by
+                digest, with rows in the order they were added within each group.
+        """
+        if not self.paths:
+            return []
+
+        if np is not None:
+            digests = np.frombuffer(bytes(self.digests), dtype=f'V{self.digest_size}')
+            order = np.argsort(digests, kind='stable')
+            ordered = digests[order]
+            starts = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+            counts = np.diff(np.append(starts, len(order)))
+            return [
+                order[start:start + count].tolist()
+                for start, count in zip(starts.tolist(), counts.tolist()) if count > 1
+            ]
+
+        by_digest = {}
+        for path_id in range(len(self.paths)):
+            by_digest.setdefault(self.digest(path_id), []).append(path_id)
+        return [group for _, group in sorted(by_digest.items()) if len(group) > 1]
+
+    def links(self, groups: list) -> tuple:
+        """
+        Find the members of groups that are hardlinks of an earlier member of their group.
+
+        Such members share their (device, inode) with a row before them in the
+        group, so they take no space of their own. Rows without a fingerprint
+        are never counted as links.
+
+        Args:
+            groups (list): Lists of path ids, as returned by groups().
+        Returns:
+            tuple: (group indexes, path ids) lists, holding for each extra link the
+                index of its group in groups and its path id.
+        """
+        if not groups:
+            return [], []
+
+        if np is not None:
+            lengths = np.fromiter(map(len, groups), dtype=np.int64, count=len(groups))
+            ids = np.fromiter(itertools.chain.from_iterable(groups), dtype=np.int64, count=int(lengths.sum()))
+            owners = np.repeat(np.arange(len(groups), dtype=np.uint64), lengths)
+            known = np.flatnonzero(np.frombuffer(self.sizes, dtype=np.int64)[ids] >= 0)
+            keys = np.stack((
+                owners[known],
+                np.frombuffer(self.devices, dtype=np.uint64)[ids[known]],
+                np.frombuffer(self.inodes, dtype=np.uint64)[ids[known]],
+            ), axis=1)
+            # Stable, so the first row of each (group, device, inode) is the one kept
+            _, firsts = np.unique(keys, axis=0, return_index=True)
+            extra = np.delete(known, firsts)
+            return owners[extra].astype(np.int64).tolist(), ids[extra].tolist()
+
+        owners = []
+        links = []
+        for index, group in enumerate(groups):
+            seen = set()
+            for path_id in group:
+                if self.sizes[path_id] < 0:
+                    continue
+                inode = (self.devices[path_id], self.inodes[path_id])
+                if inode in seen:
+                    owners.append(index)
+                    links.append(path_id)
+                seen.add(inode)
+        return owners, links
+
+    def reclaimable(self, groups: list, link_owners: list = None) -> list:
+        """
+        Compute the bytes freed by keeping a single copy of each group.
+
+        Hardlinks of a member already share its storage and free nothing.
+
+        Args:
+            groups (list): Lists of path ids, as returned by groups().
+            link_owners (list, optional): The group indexes of the extra links, as returned
+                by links(); found here if not given.
+        Returns:
+            list: The reclaimable bytes of each group; files of unknown size count as 0.
+        """
+        if not groups:
+            return []
+        if link_owners is None:
+            link_owners, _ = self.links(groups)
+
+        if np is not None:
+            sizes = np.frombuffer(self.sizes, dtype=np.int64)
+            firsts = np.fromiter((group[0] for group in groups), dtype=np.int64, count=len(groups))
+            lengths = np.fromiter(map(len, groups), dtype=np.int64, count=len(groups))
+            copies = lengths - np.bincount(np.asarray(link_owners, dtype=np.int64), minlength=len(groups))
+            return (np.maximum(sizes[firsts], 0) * (copies - 1)).tolist()
+
+        copies = [len(group) for group in groups]
+        for index in link_owners:
+            copies[index] -= 1
+        return [max(self.sizes[group[0]], 0) * (count - 1) for group, count in zip(groups, copies)]
+
+    def by_size(self, groups: list, reclaimable: list = None) -> list:
+        """
+        Sort groups so that the ones freeing the most bytes come first.
+
+        Args:
+            groups (list): Lists of path ids, as returned by groups().
+            reclaimable (list, optional): Reclaimable bytes per group, as returned by reclaimable().
+        Returns:
+            list: (group, reclaimable bytes) pairs, largest first.
+        """
+        if reclaimable is None:
+            reclaimable = self.reclaimable(groups)
+
+        if np is not None and groups:
+            order = np.argsort(-np.asarray(reclaimable, dtype=np.int64), kind='stable').tolist()
+        else:
+            order = sorted(range(len(groups)), key=lambda index: -reclaimable[index])
+        return [(groups[index], reclaimable[index]) for index in order]
@@ -1,4 +1,5 @@
 import os
+import stat
 
 class FilesHelper:
     @staticmethod
@@ -93,6 +94,52 @@ class FilesHelper:
                 print(f"Unexpected error accessing directory: {dir} - {str(e)}")
             return []
 
+    @staticmethod
+    def scan_dir(dir: str, verbose: bool = False, logger=None) -> list:
+        """
+        Get the entries of a directory without recursion.
+
+        The returned os.DirEntry objects cache the file type reported by the
+        directory listing and the result of their first stat() call, so callers
+        can classify and fingerprint entries without further syscalls.
+
+        Args:
+            dir (str): The directory to get entries from.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            list: A list of os.DirEntry objects for the given directory, or None if it
+                cannot be listed, so that callers can tell a failure from an empty directory.
+        """
+
+        try:
+            with os.scandir(dir) as entries:
+                return list(entries)
+        except FileNotFoundError:
+            if logger:
+                logger.warning(f"Directory not found: {dir}")
+            elif verbose:
+                print(f"Directory not found: {dir}")
+            return None
+        except PermissionError as e:
+            if logger:
+                logger.warning(f"Permission denied accessing directory: {dir} - {str(e)}")
+            elif verbose:
+                print(f"Permission denied accessing directory: {dir} - {str(e)}")
+            return None
+        except OSError as e:
+            if logger:
+                logger.warning(f"OS error accessing directory: {dir} - {str(e)}")
+            elif verbose:
+                print(f"OS error accessing directory: {dir} - {str(e)}")
+            return None
+        except Exception as e:
+            if logger:
+                logger.error(f"Unexpected error accessing directory: {dir} - {str(e)}")
+            elif verbose:
+                print(f"Unexpected error accessing directory: {dir} - {str(e)}")
+            return None
+
     @staticmethod
     def get_file_metadata(file_path: str, verbose: bool = False, logger=None) -> dict:
         """
@@ -103,17 +150,11 @@ class FilesHelper:
             verbose (bool, optional): If True, print verbose output. Defaults to False.
             logger: Logger instance for logging messages.
         Returns:
-            dict: A dictionary containing file size, creation time, and modification time.
-                  None if the file cannot be accessed.
+            dict: A dictionary containing file size, type, modification time and
+                  the device/inode identifying the file. None if the file cannot be accessed.
         """
         try:
-            stats = os.stat(file_path)
-            metadata = {
-                "size": stats.st_size,
-                "type": stats.st_mode,
-                "date_modified": stats.st_mtime,
-            }
-            return metadata
+            return FilesHelper.metadata_from_stat(os.stat(file_path))
         except FileNotFoundError:
             if logger:
                 logger.warning(f"File not found: {file_path}")
@@ -137,4 +178,87 @@ class FilesHelper:
                 logger.error(f"Unexpected error getting metadata: {file_path} - {str(e)}")
             elif verbose:
                 print(f"Unexpected error getting metadata: {file_path} - {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def metadata_from_stat(stats: os.stat_result) -> dict:
+        """
+        Build file metadata from an existing stat result, e.g. a cached DirEntry.stat().
+
+        Args:
+            stats (os.stat_result): The stat result of the file.
+        Returns:
+            dict: The metadata, in the format returned by get_file_metadata.
+        """
+        return {
+            "size": stats.st_size,
+            "type": stats.st_mode,
+            "date_modified": stats.st_mtime,
+            "mtime_ns": stats.st_mtime_ns,
+            "device": stats.st_dev,
+            "inode": stats.st_ino,
+        }
+
+    @staticmethod
+    def fingerprint(metadata: dict) -> tuple:
+        """
+        Build the stat fingerprint used to detect unchanged files.
+
+        Args:
+            metadata (dict): Metadata as returned by get_file_metadata.
+        Returns:
+            tuple: A (device, inode, size, mtime_ns) tuple.
+        """
+        return (metadata["device"], metadata["inode"], metadata["size"], metadata["mtime_ns"])
+
+    @staticmethod
+    def dir_fingerprint(stats: os.stat_result) -> tuple:
+        """
+        Build the stat fingerprint used to detect directories whose listing is unchanged.
+
+        A directory's mtime changes when entries are added, removed or renamed in it,
+        but not when the content of an entry changes.
+
+        Args:
+            stats (os.stat_result): The stat result of the directory.
+        Returns:
+            tuple: A (device, inode, mtime_ns) tuple.
+        """
+        return (stats.st_dev, stats.st_ino, stats.st_mtime_ns)
+
+    @staticmethod
+    def stale_entries(entries: list) -> list:
+        """
+        Find the catalog entries that no longer match the file system.
+
+        An entry is stale if its path is gone, is no longer of the same kind, or
+        has a different stat fingerprint. Paths that cannot be checked, e.g. for
+        lack of permission, are kept.
+
+        Args:
+            entries (list): (kind, path, fingerprint) tuples, as listed by a store.
+        Returns:
+            list: The paths of the stale entries.
+        """
+        stale = []
+        for kind, path, fingerprint in entries:
+            try:
+                stats = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
+                stale.append(path)
+                continue
+            except OSError:
+                continue
+
+            if kind == 'dirs':
+                current = stat.S_ISDIR(stats.st_mode) and (
+                    fingerprint is None or FilesHelper.dir_fingerprint(stats) == fingerprint
+                )
+            else:
+                current = stat.S_ISREG(stats.st_mode) and (
+                    fingerprint is None
+                    or FilesHelper.fingerprint(FilesHelper.metadata_from_stat(stats)) == fingerprint
+                )
+            if not current:
+                stale.append(path)
+        return stale
@@ -1,40 +1,129 @@
 import os
+import copy
+import mmap
 import hashlib
 import pickle
+import threading
 from src.constants import HASHES_PICKLE_PATH
+from src.constants import HASHES_JOURNAL_PATH
 from src.constants import EMPTY_HASHES_PICKLE
-from typing import Optional
+from src.constants import PARTIAL_HASH_SIZE
+from src.constants import DEFAULT_ALGORITHM
+from src.constants import HASH_BUFFER_SIZE
+from src.constants import MMAP_THRESHOLD
+
+# Per-thread read buffers, reused across files instead of allocating a bytes object per read
+_buffers = threading.local()
 
 class HashHelper:
     @staticmethod
-    def hash_file(filepath: str, verbose: bool = False, logger=None) -> str:
+    def new_hash(algorithm: str = DEFAULT_ALGORITHM):
         """
-        Hash a file using SHA-256.
+        Create a hash object for one of the supported digest algorithms.
+
+        Args:
+            algorithm (str, optional): A name from ALGORITHMS. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            A hashlib hash object.
+        Raises:
+            ValueError: If the algorithm is not available.
+        """
+
+        return hashlib.new(algorithm)
+
+    @staticmethod
+    def _read_buffer() -> memoryview:
+        """Return this thread's reusable read buffer."""
+        buffer = getattr(_buffers, 'view', None)
+        if buffer is None:
+            buffer = _buffers.view = memoryview(bytearray(HASH_BUFFER_SIZE))
+        return buffer
+
+    @staticmethod
+    def pick_read_method(size: int) -> str:
+        """
+        Choose how to read a file of the given size.
+
+        Small files are read in one call, large files are memory-mapped, and
+        everything in between is read into a reusable buffer (through
+        hashlib.file_digest where available).
+
+        Args:
+            size (int): The size of the file in bytes.
+        Returns:
+            str: A name from READ_METHODS.
+        """
+
+        if size <= HASH_BUFFER_SIZE:
+            return 'readall'
+        if size >= MMAP_THRESHOLD:
+            return 'mmap'
+        if hasattr(hashlib, 'file_digest'):
+            return 'file_digest'
+        return 'readinto'
+
+    @staticmethod
+    def hash_file(
+        filepath: str,
+        verbose: bool = False,
+        logger=None,
+        algorithm: str = DEFAULT_ALGORITHM,
+        method: str = None,
+        size: int = None,
+    ) -> bytes:
+        """
+        Hash a file using the given digest algorithm.
 
         Args:
             filepath (str): The path to the file.
             verbose (bool, optional): If True, print verbose output. Defaults to False.
             logger: Logger instance for logging messages.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+            method (str, optional): How to read the file, from READ_METHODS. Defaults to
+                picking one from the file size with pick_read_method.
+            size (int, optional): The size of the file, when the caller already stat'ed
+                it. Defaults to an fstat call on the opened file.
         Returns:
-            str: The SHA-256 hash of the file.
+            bytes: The raw digest of the file.
         Raises:
             PermissionError: If the file cannot be read due to permissions.
             OSError: If the file cannot be read for other reasons.
             IOError: If there's an I/O error reading the file.
         """
         
-        BUF_SIZE = 65536  # Read in 64kb chunks
-        sha256 = hashlib.sha256()
+        digest = HashHelper.new_hash(algorithm)
 
         try:
-            with open(filepath, 'rb') as f:
-                while True:
-                    data = f.read(BUF_SIZE)
-                    if not data:
-                        break
-                    sha256.update(data)
+            with open(filepath, 'rb', buffering=0) as f:
+                if size is None and method in (None, 'mmap'):
+                    size = os.fstat(f.fileno()).st_size
+                if method is None:
+                    method = HashHelper.pick_read_method(size)
+
+                if method == 'read':
+                    # Plain reads in 64kb chunks, one new bytes object per read
+                    while True:
+                        data = f.read(65536)
+                        if not data:
+                            break
+                        digest.update(data)
+                elif method == 'readall':
+                    digest.update(f.readall())
+                elif method == 'file_digest':
+                    digest = hashlib.file_digest(f, lambda: digest)
+                elif method == 'mmap':
+                    if size > 0:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                            digest.update(mapped)
+                else:
+                    buffer = HashHelper._read_buffer()
+                    while True:
+                        read = f.readinto(buffer)
+                        if not read:
+                            break
+                        digest.update(buffer[:read])
             
-            return sha256.hexdigest()
+            return digest.digest()
             
         except PermissionError:
             raise PermissionError(f"Permission denied")
@@ -48,37 +137,225 @@ class HashHelper:
             raise IOError(f"Unexpected error reading file: {str(e)}")
 
     @staticmethod
-    def hash_list(hashes: list[str], verbose: bool = False, logger=None) -> str:
+    def hash_files(filepaths: list, algorithm: str = DEFAULT_ALGORITHM, sizes: list = None) -> list:
+        """
+        Hash a batch of files, e.g. in a worker process.
+
+        Errors are returned instead of raised so that one unreadable file does not
+        lose the results of the rest of the batch.
+
+        Args:
+            filepaths (list): The paths to the files.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+            sizes (list, optional): The size of each file, as known to the caller.
+        Returns:
+            list: A (path, hash, error) tuple per file; hash is None and error holds
+                the message when the file could not be read.
+        """
+
+        results = []
+        if sizes is None:
+            sizes = [None] * len(filepaths)
+        for filepath, size in zip(filepaths, sizes):
+            try:
+                results.append((filepath, HashHelper.hash_file(filepath, algorithm=algorithm, size=size), None))
+            except (PermissionError, OSError, IOError) as e:
+                results.append((filepath, None, str(e)))
+        return results
+
+    @staticmethod
+    def hash_partial(
+        filepath: str, offset: int, length: int = PARTIAL_HASH_SIZE, algorithm: str = DEFAULT_ALGORITHM
+    ) -> bytes:
         """
-        Hash a list of strings using SHA-256.
+        Hash a single block of a file.
 
         Args:
-            hashes (list[str]): The list of strings to hash.
+            filepath (str): The path to the file.
+            offset (int): Where the block starts. Negative offsets count from the end of the file.
+            length (int, optional): The size of the block. Defaults to PARTIAL_HASH_SIZE.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            bytes: The raw digest of the block.
+        Raises:
+            OSError: If the file cannot be read.
+        """
+
+        with open(filepath, 'rb') as f:
+            if offset < 0:
+                f.seek(max(0, os.fstat(f.fileno()).st_size + offset))
+            else:
+                f.seek(offset)
+            digest = HashHelper.new_hash(algorithm)
+            digest.update(f.read(length))
+            return digest.digest()
+
+    @staticmethod
+    def staged_filter(
+        groups: list, size: int, stats: dict = None, logger=None, algorithm: str = DEFAULT_ALGORITHM
+    ) -> list:
+        """
+        Narrow groups of same-size files down to those that may be identical.
+
+        Files are compared by a hash of their head block, then of their tail block.
+        Each stage only reads the files that survived the previous one, and a file
+        that no longer shares its stage hash with another file is eliminated.
+
+        Args:
+            groups (list): Lists of paths to files that all have the given size.
+            size (int): The size shared by every file, in bytes.
+            stats (dict, optional): Per-stage elimination counts, updated in place
+                under the 'head' and 'tail' keys.
+            logger: Logger instance for logging messages.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            list: The groups that survived every stage, each with two or more paths.
+        """
+
+        stages = [('head', 0)]
+        # The head block already covers small files entirely
+        if size > PARTIAL_HASH_SIZE:
+            stages.append(('tail', -PARTIAL_HASH_SIZE))
+
+        for stage, offset in stages:
+            survivors = []
+            eliminated = 0
+
+            for group in groups:
+                by_hash = {}
+                for path in group:
+                    try:
+                        by_hash.setdefault(HashHelper.hash_partial(path, offset, algorithm=algorithm), []).append(path)
+                    except OSError as e:
+                        # Left for the full hash, which reports the error
+                        if logger:
+                            logger.debug(f"Cannot read {stage} block: {path} - {str(e)}")
+                        by_hash.setdefault(None, []).append(path)
+
+                unreadable = by_hash.pop(None, [])
+                for paths in by_hash.values():
+                    if len(paths) > 1:
+                        survivors.append(paths)
+                    else:
+                        eliminated += 1
+                if unreadable:
+                    survivors.append(unreadable)
+
+            if stats is not None:
+                stats[stage] = stats.get(stage, 0) + eliminated
+            groups = survivors
+
+        return groups
+
+    @staticmethod
+    def hash_list(
+        hashes: list[bytes], verbose: bool = False, logger=None, algorithm: str = DEFAULT_ALGORITHM
+    ) -> bytes:
+        """
+        Hash a list of digests.
+
+        The digests are hashed in their hex form, so directory digests are the
+        same as when digests were kept as hex strings.
+
+        Args:
+            hashes (list[bytes]): The list of raw digests to hash.
             verbose (bool, optional): If True, print verbose output. Defaults to False.
             logger: Logger instance for logging messages.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
         Returns:
-            str: The SHA-256 hash of the concatenated strings.
+            bytes: The raw digest of the concatenated hex digests.
         """
 
         try:
-            sha256 = hashlib.sha256()
+            digest = HashHelper.new_hash(algorithm)
 
             for item in sorted(hashes):
                 if item is not None:  # Skip None values from failed hashes
-                    sha256.update(item.encode('utf-8'))
+                    digest.update(item.hex().encode('ascii'))
 
-            return sha256.hexdigest()
+            return digest.digest()
         except Exception as e:
             # If hashing fails, return a hash of empty string
             # This shouldn't happen but provides a fallback
             if logger:
                 logger.warning(f"Error hashing list, using fallback: {str(e)}")
-            return hashlib.sha256(b'').hexdigest()
+            return HashHelper.new_hash(algorithm).digest()
+
+    @staticmethod
+    def empty_hashes() -> dict:
+        """
+        Build a fresh, empty hashes structure.
+
+        Returns:
+            dict: A deep copy of EMPTY_HASHES_PICKLE that is safe to mutate.
+        """
+
+        return copy.deepcopy(EMPTY_HASHES_PICKLE)
+
+    @staticmethod
+    def placeholder_hash(path: str, algorithm: str = DEFAULT_ALGORITHM) -> bytes:
+        """
+        Build a stand-in hash for a file that was not read.
+
+        Files skipped by the size prefilter cannot have a duplicate, so their
+        contribution to a directory hash only needs to be unique to the path.
+
+        Args:
+            path (str): The path to the file.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            bytes: A raw digest derived from the path.
+        """
+
+        digest = HashHelper.new_hash(algorithm)
+        digest.update(f"unhashed:{path}".encode('utf-8'))
+        return digest.digest()
+
+    @staticmethod
+    def hash_symlink(path: str, algorithm: str = DEFAULT_ALGORITHM) -> bytes:
+        """
+        Hash a symbolic link itself, without following it.
+
+        The digest covers the link target as written in the link, so two links
+        pointing to the same place contribute the same hash to their directories.
+
+        Args:
+            path (str): The path to the symbolic link.
+            algorithm (str, optional): The digest algorithm. Defaults to DEFAULT_ALGORITHM.
+        Returns:
+            bytes: A raw digest derived from the link target.
+        Raises:
+            OSError: If the link cannot be read.
+        """
+
+        digest = HashHelper.new_hash(algorithm)
+        digest.update(b"symlink:" + os.fsencode(os.readlink(path)))
+        return digest.digest()
+
+    @staticmethod
+    def digest_bytes(hash_value):
+        """
+        Convert a digest to its raw form.
+
+        Catalogs, journals and exports written by older versions hold hex strings.
+
+        Args:
+            hash_value (bytes | str): A raw digest, or its hex form.
+        Returns:
+            bytes: The raw digest.
+        """
+
+        if isinstance(hash_value, str):
+            return bytes.fromhex(hash_value)
+        return hash_value
 
     @staticmethod
     def load_hashes(verbose: bool = False, logger=None) -> dict:
         """
-        Load hashes from a pickle file.
+        Load hashes from the pickle snapshot.
+
+        The snapshot may use the layout of an older version; HashStore upgrades
+        it and replays the journal on top of it.
 
         Args:
             verbose (bool, optional): If True, print verbose output. Defaults to False.
@@ -92,35 +369,38 @@ class HashHelper:
                 with open(HASHES_PICKLE_PATH, 'rb') as f:
                     hashes = pickle.load(f)
                     
-                    if not isinstance(hashes, dict) or 'files' not in hashes or 'dirs' not in hashes:
-                        if logger:
-                            logger.warning("Invalid hash file structure, creating new one")
-                        elif verbose:
-                            print(f"Invalid hash file structure, creating new one")
-                        return EMPTY_HASHES_PICKLE.copy()
-                    
-                    return hashes
+                if not isinstance(hashes, dict) or 'files' not in hashes or 'dirs' not in hashes:
+                    if logger:
+                        logger.warning("Invalid hash file structure, creating new one")
+                    elif verbose:
+                        print(f"Invalid hash file structure, creating new one")
+                    hashes = HashHelper.empty_hashes()
             else:
-                return EMPTY_HASHES_PICKLE.copy()
+                hashes = HashHelper.empty_hashes()
+
+            return hashes
                 
         except (pickle.PickleError, EOFError) as e:
             if logger:
                 logger.warning(f"Error loading pickle file: {str(e)}. Creating new hash file.")
             elif verbose:
                 print(f"Error loading pickle file: {str(e)}. Creating new hash file.")
-            return EMPTY_HASHES_PICKLE.copy()
+            return HashHelper.empty_hashes()
         except Exception as e:
             if logger:
                 logger.warning(f"Unexpected error loading hashes: {str(e)}. Creating new hash file.")
             elif verbose:
                 print(f"Unexpected error loading hashes: {str(e)}. Creating new hash file.")
-            return EMPTY_HASHES_PICKLE.copy()
+            return HashHelper.empty_hashes()
     
     @staticmethod
     def save_hashes(hashes: dict, verbose: bool = False, logger=None) -> bool:
         """
         Save hashes to a pickle file.
 
+        The snapshot is written to a temporary file and moved into place, so a
+        crash mid-write never leaves a truncated pickle behind.
+
         Args:
             hashes (dict): The hashes to save.
             verbose (bool, optional): If True, print verbose output. Defaults to False.
@@ -139,8 +419,10 @@ class HashHelper:
                 except Exception:
                     pass
             
-            with open(HASHES_PICKLE_PATH, 'wb') as f:
-                pickle.dump(hashes, f)
+            tmp_path = f"{HASHES_PICKLE_PATH}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(hashes, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, HASHES_PICKLE_PATH)
             
             return True
             
@@ -176,7 +458,9 @@ class HashHelper:
         """
 
         try:
-            return HashHelper.save_hashes(EMPTY_HASHES_PICKLE.copy(), verbose=verbose, logger=logger)
+            if os.path.exists(HASHES_JOURNAL_PATH):
+                os.remove(HASHES_JOURNAL_PATH)
+            return HashHelper.save_hashes(HashHelper.empty_hashes(), verbose=verbose, logger=logger)
         except Exception as e:
             if logger:
                 logger.error(f"Error clearing hashes: {str(e)}")
@@ -0,0 +1,880 @@
+import os
+import copy
+import time
+import pickle
+from typing import Optional
+from src.hash_helper import HashHelper
+from src.sqlite_store import SqliteHashStore
+from src.constants import HASHES_PICKLE_PATH
+from src.constants import HASHES_JOURNAL_PATH
+from src.constants import HASHES_DB_PATH
+from src.constants import EMPTY_HASHES_PICKLE
+from src.constants import DEFAULT_BACKEND
+from src.constants import DEFAULT_ALGORITHM
+from src.constants import JOURNAL_CHECKPOINT_RECORDS
+from src.constants import JOURNAL_CHECKPOINT_SECONDS
+
+class HashStore:
+    """
+    A hash catalog persisted as a pickle snapshot plus an append-only journal.
+
+    Paths are interned through a table of directories: files are kept as
+    (dir_id, name) records, so a directory prefix is stored once rather than
+    once per file, and full paths are only rebuilt when they are returned.
+    Each record holds its hash and each group sharing a hash is a dict, so
+    recording, moving or removing a path is O(1) and a changed file leaves its
+    previous group.
+
+    Every recorded hash is appended to the journal, which costs O(1) per file.
+    The full snapshot is only rewritten at checkpoints, after which the journal
+    is truncated. Loading the store replays the journal over the snapshot.
+    """
+
+    def __init__(
+        self,
+        verbose: bool = False,
+        logger=None,
+        checkpoint_records: int = JOURNAL_CHECKPOINT_RECORDS,
+        checkpoint_seconds: float = JOURNAL_CHECKPOINT_SECONDS,
+    ):
+        """
+        Load the catalog and prepare the journal for appending.
+
+        Args:
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+            checkpoint_records (int, optional): Minimum journal records between snapshots.
+            checkpoint_seconds (float, optional): Maximum seconds between snapshots while records are pending.
+        """
+        self.verbose = verbose
+        self.logger = logger
+        self.location = HASHES_PICKLE_PATH
+        # Snapshots written by older versions use an older layout
+        self.hashes = HashStore.upgrade_hashes(HashHelper.load_hashes(verbose=verbose, logger=logger))
+        HashStore.replay_journal(self.hashes, verbose=verbose, logger=logger)
+        self.checkpoint_records = checkpoint_records
+        self.checkpoint_seconds = checkpoint_seconds
+        self._journal = None
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+        self._snapshot_size = self._entry_count()
+        self._sizes = None
+
+    def _entry_count(self) -> int:
+        """Count the paths currently held in the catalog."""
+        return sum(len(records) for records in self.hashes['records'].values()) + len(self.hashes['tree'])
+
+    def _open_journal(self):
+        """Open the journal for appending, creating it if needed."""
+        if self._journal is None:
+            self._journal = open(HASHES_JOURNAL_PATH, 'ab')
+        return self._journal
+
+    def _append(self, record: tuple) -> None:
+        """
+        Apply a record in memory and append it to the journal.
+
+        Args:
+            record (tuple): A (kind, hash, path) journal record.
+        """
+        HashStore.apply_record(self.hashes, record)
+        self._index_size(record)
+
+        try:
+            journal = self._open_journal()
+            pickle.dump(record, journal, protocol=pickle.HIGHEST_PROTOCOL)
+            journal.flush()
+            self._pending += 1
+        except OSError as e:
+            if self.logger:
+                self.logger.error(f"Cannot append to journal: {str(e)}")
+            elif self.verbose:
+                print(f"Cannot append to journal: {str(e)}")
+            return
+
+        # Grow the record threshold with the catalog so the cost of rewriting
+        # the snapshot stays amortized O(1) per record.
+        threshold = max(self.checkpoint_records, self._snapshot_size)
+        elapsed = time.monotonic() - self._last_checkpoint
+        if self._pending >= threshold or elapsed >= self.checkpoint_seconds:
+            self.checkpoint()
+
+    def add_file(self, file_hash: bytes, path: str, fingerprint: tuple = None) -> None:
+        """Record the hash of a file along with its stat fingerprint."""
+        self._append(('files', file_hash, path, fingerprint))
+
+    def get_file(self, path: str) -> Optional[tuple]:
+        """
+        Look up the stored hash of a file.
+
+        Args:
+            path (str): The path to the file.
+        Returns:
+            tuple: A (hash, fingerprint) pair, or None if the file has no fingerprint stored.
+        """
+        dir_id, name = HashStore.file_key(self.hashes, path)
+        record = self.hashes['records'].get(dir_id, {}).get(name)
+        if record is None or record[0] is None or record[4] is None:
+            return None
+        return record[0], record[1:]
+
+    def add_dir(self, dir_hash: bytes, path: str, fingerprint: tuple = None, children: tuple = None) -> None:
+        """Record the hash of a directory along with its stat fingerprint and entry names."""
+        if fingerprint is None:
+            self._append(('dirs', dir_hash, path))
+        else:
+            self._append(('dirs', dir_hash, path, fingerprint, tuple(children)))
+
+    def get_dir(self, path: str) -> Optional[tuple]:
+        """
+        Look up the stored hash and listing of a directory.
+
+        Args:
+            path (str): The path to the directory.
+        Returns:
+            tuple: A (hash, fingerprint, children) tuple, or None if the directory has no
+                fingerprint stored.
+        """
+        entry = self.hashes['tree'].get(HashStore.dir_id(self.hashes, path))
+        if entry is None or entry[1] is None:
+            return None
+        return entry
+
+    def remove_path(self, path: str) -> None:
+        """Forget a file or directory, e.g. one that no longer exists."""
+        self._append(('remove', None, path))
+
+    def move_path(self, old_path: str, new_path: str) -> None:
+        """Record what is known about a file or directory under its new path; a no-op if old_path is unknown."""
+        self._append(('move', new_path, old_path))
+
+    def add_unhashed(self, path: str, fingerprint: tuple) -> None:
+        """Record a file that was skipped by the size prefilter."""
+        self._append(('unhashed', None, path, fingerprint))
+
+    def remove_unhashed(self, path: str) -> None:
+        """Forget a file that was skipped by the size prefilter."""
+        self._append(('unhashed', None, path, None))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Read a catalog setting, or None if it was never set."""
+        return self.hashes['meta'].get(key)
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Record a catalog setting."""
+        self._append(('meta', value, key))
+
+    def is_empty(self) -> bool:
+        """Check whether the catalog holds no file or directory."""
+        return not (self.hashes['records'] or self.hashes['tree'])
+
+    def _index_size(self, record: tuple) -> None:
+        """Keep the size index, if it has been built, in step with a record."""
+        if self._sizes is None or record[0] not in ('files', 'unhashed') or len(record) < 4 or record[3] is None:
+            return
+        self._sizes.setdefault(record[3][2], set()).add(HashStore.file_key(self.hashes, record[2]))
+
+    def _size_index(self) -> dict:
+        """Build the size -> file keys index on first use."""
+        if self._sizes is None:
+            self._sizes = {}
+            for dir_id, records in self.hashes['records'].items():
+                for name, record in records.items():
+                    if record[3] is not None:
+                        self._sizes.setdefault(record[3], set()).add((dir_id, name))
+        return self._sizes
+
+    def paths_with_size(self, size: int) -> list:
+        """
+        List the catalogued files, hashed or not, that have the given size.
+
+        Args:
+            size (int): The file size in bytes.
+        Returns:
+            list: The matching paths.
+        """
+        return [
+            HashStore.file_path(self.hashes, key) for key, _ in self._records_with_size(size)
+        ]
+
+    def _records_with_size(self, size: int) -> list:
+        """List the (key, record) pairs of the files that still have the given size."""
+        records = self.hashes['records']
+        matches = []
+        for key in self._size_index().get(size, ()):
+            record = records.get(key[0], {}).get(key[1])
+            if record is not None and record[3] == size:
+                matches.append((key, record))
+        return matches
+
+    def unhashed_with_size(self, size: int) -> list:
+        """
+        List the files skipped by the size prefilter that have the given size.
+
+        Args:
+            size (int): The file size in bytes.
+        Returns:
+            list: (path, fingerprint) pairs.
+        """
+        return [
+            (HashStore.file_path(self.hashes, key), record[1:])
+            for key, record in self._records_with_size(size) if record[0] is None
+        ]
+
+    def entries(self) -> list:
+        """
+        List every catalogued path with what is needed to check it is still current.
+
+        Returns:
+            list: (kind, path, fingerprint) tuples, where kind is 'files' or 'dirs' and
+                fingerprint is None for entries recorded without one. Unhashed files are
+                listed as 'files'.
+        """
+        entries = []
+        for dir_id, records in self.hashes['records'].items():
+            dir_path = HashStore.dir_path(self.hashes, dir_id)
+            for name, record in records.items():
+                fingerprint = record[1:] if record[4] is not None else None
+                entries.append(('files', os.path.join(dir_path, name), fingerprint))
+        for dir_id, (_, fingerprint, _) in self.hashes['tree'].items():
+            entries.append(('dirs', HashStore.dir_path(self.hashes, dir_id), fingerprint))
+        return entries
+
+    def duplicates(self, kind: str):
+        """
+        Yield groups of paths that share a digest.
+
+        Args:
+            kind (str): Either 'files' or 'dirs'.
+        Yields:
+            tuple: A (digest, list of paths) pair per duplicate group.
+        """
+        to_path = HashStore.file_path if kind == 'files' else HashStore.dir_path
+        for digest, group in self.hashes[kind].items():
+            if isinstance(group, dict):
+                yield digest, [to_path(self.hashes, member) for member in group]
+
+    def clear(self) -> bool:
+        """
+        Remove every file and directory from the catalog.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._pending = 0
+        self.hashes = HashHelper.empty_hashes()
+        self._snapshot_size = 0
+        self._sizes = None
+        return HashHelper.clear_hashes(verbose=self.verbose, logger=self.logger)
+
+    def duplicate_files(self):
+        """
+        Yield the files that share their digest with another file.
+
+        Yields:
+            tuple: A (path, digest, fingerprint) tuple per file; fingerprint is None
+                for files recorded without one.
+        """
+        records = self.hashes['records']
+        for digest, group in self.hashes['files'].items():
+            if isinstance(group, dict):
+                for key in group:
+                    record = records[key[0]][key[1]]
+                    fingerprint = record[1:] if record[4] is not None else None
+                    yield HashStore.file_path(self.hashes, key), digest, fingerprint
+
+    def import_hashes(self, hashes: dict) -> int:
+        """
+        Merge a {'files', 'dirs', 'stats', 'unhashed', 'meta', 'tree'} hashes structure into the catalog.
+
+        Args:
+            hashes (dict): The hashes structure to import.
+        Returns:
+            int: The number of paths imported.
+        """
+        imported = sum(len(paths) for kind in ('files', 'dirs') for paths in hashes[kind].values())
+        for record in HashStore.exchange_records(hashes):
+            HashStore.apply_record(self.hashes, record)
+        self._sizes = None
+        self.checkpoint()
+        return imported
+
+    def export_hashes(self) -> dict:
+        """
+        Export the catalog as a {'files', 'dirs', 'stats', 'unhashed', 'meta', 'tree'} hashes structure.
+
+        Returns:
+            dict: The hashes structure, keyed by full paths like the export of every backend.
+        """
+        return HashStore.exported(self.hashes)
+
+    def checkpoint(self) -> bool:
+        """
+        Write a full snapshot and truncate the journal.
+
+        The snapshot is written before the journal is truncated, so a crash in
+        between only leaves records that replay idempotently.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if not HashHelper.save_hashes(HashStore.snapshot(self.hashes), verbose=self.verbose, logger=self.logger):
+            return False
+
+        try:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(HASHES_JOURNAL_PATH):
+                os.remove(HASHES_JOURNAL_PATH)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Cannot truncate journal: {str(e)}")
+            elif self.verbose:
+                print(f"Cannot truncate journal: {str(e)}")
+
+        self._pending = 0
+        self._last_checkpoint = time.monotonic()
+        self._snapshot_size = self._entry_count()
+        return True
+
+    def flush(self) -> bool:
+        """
+        Make every record written so far survive the end of the process.
+
+        Records are flushed to the journal as they are appended, so there is
+        nothing left to do.
+
+        Returns:
+            bool: True.
+        """
+        return True
+
+    def close(self) -> None:
+        """Checkpoint any pending records and release the journal."""
+        if self._pending:
+            self.checkpoint()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    @staticmethod
+    def apply_record(hashes: dict, record: tuple) -> None:
+        """
+        Apply a single journal record to a hashes structure.
+
+        Records are idempotent, so replaying a journal over a snapshot that
+        already contains some of its records is harmless.
+
+        Args:
+            hashes (dict): The hashes structure to update in place.
+            record (tuple): A (kind, hash, path) tuple where kind is 'files' or 'dirs',
+                optionally followed by the stat fingerprint of a file, or by the fingerprint
+                and children of a directory. Kind 'unhashed' records a file skipped by the
+                size prefilter (a None fingerprint removes it), kind 'meta' records a
+                (kind, value, key) catalog setting, kind 'remove' forgets a path and kind
+                'move' records a (kind, new_path, old_path) rename.
+        """
+
+        kind, hash_value, path = record[:3]
+
+        if kind == 'remove':
+            HashStore._remove_path(hashes, path)
+            return
+
+        if kind == 'move':
+            HashStore._move_path(hashes, path, hash_value)
+            return
+
+        if kind == 'meta':
+            hashes['meta'][path] = hash_value
+            return
+
+        fingerprint = record[3] if len(record) > 3 else None
+
+        if kind == 'unhashed':
+            dir_id, name = HashStore.file_key(hashes, path, create=fingerprint is not None)
+            records = hashes['records'].get(dir_id, {})
+            old = records.get(name)
+            if fingerprint is not None:
+                if old is not None and old[0] is not None:
+                    HashStore._ungroup(hashes, 'files', (dir_id, name), old[0])
+                hashes['records'].setdefault(dir_id, records)[name] = (None,) + tuple(fingerprint)
+            elif old is not None and old[0] is None:
+                HashStore._drop_record(hashes, dir_id, name)
+            return
+
+        hash_value = HashHelper.digest_bytes(hash_value)
+
+        if kind == 'files':
+            key = dir_id, name = HashStore.file_key(hashes, path, create=True)
+            records = hashes['records'].setdefault(dir_id, {})
+            old = records.get(name)
+            if old is not None and old[0] is not None and old[0] != hash_value:
+                HashStore._ungroup(hashes, 'files', key, old[0])
+            if fingerprint is None:
+                # Keep a known fingerprint when the same hash is recorded without one
+                same = old is not None and old[0] == hash_value
+                fingerprint = old[1:] if same else (None,) * 4
+            records[name] = (hash_value,) + tuple(fingerprint)
+            HashStore._group(hashes, 'files', key, hash_value)
+            return
+
+        dir_id = HashStore.dir_id(hashes, path, create=True)
+        old = hashes['tree'].get(dir_id)
+        if old is not None and old[0] != hash_value:
+            HashStore._ungroup(hashes, 'dirs', dir_id, old[0])
+        if fingerprint is not None:
+            hashes['tree'][dir_id] = (hash_value, fingerprint, tuple(record[4]))
+        elif old is None or old[0] != hash_value:
+            hashes['tree'][dir_id] = (hash_value, None, None)
+        HashStore._group(hashes, 'dirs', dir_id, hash_value)
+
+    @staticmethod
+    def _dir_index(hashes: dict) -> dict:
+        """
+        Build, on first use, the in-memory path -> id index of the directory table.
+
+        Only the table of (parent_id, name) pairs is saved; the full path of each
+        directory is rebuilt from it once per load.
+
+        Args:
+            hashes (dict): The hashes structure.
+        Returns:
+            dict: Maps each directory path to its id.
+        """
+
+        index = hashes.get('dir_index')
+        if index is None:
+            paths = []
+            for parent_id, name in hashes['dir_table']:
+                paths.append(name if parent_id is None else os.path.join(paths[parent_id], name))
+            index = {path: dir_id for dir_id, path in enumerate(paths)}
+            hashes['dir_paths'] = paths
+            hashes['dir_index'] = index
+        return index
+
+    @staticmethod
+    def dir_id(hashes: dict, path: str, create: bool = False) -> Optional[int]:
+        """
+        Find the id of a directory in the directory table.
+
+        Args:
+            hashes (dict): The hashes structure.
+            path (str): The path to the directory.
+            create (bool, optional): If True, add the directory and any missing
+                ancestor to the table. Defaults to False.
+        Returns:
+            int: The id of the directory, or None if it is not in the table.
+        """
+
+        index = HashStore._dir_index(hashes)
+        dir_id = index.get(path)
+        if dir_id is not None or not create:
+            return dir_id
+
+        # Walk up to the closest known ancestor, then add the missing ones top-down
+        missing = []
+        while path not in index:
+            head, name = os.path.split(path)
+            if not name:
+                missing.append((None, path, path))
+                break
+            missing.append((head, name, path))
+            path = head
+
+        for head, name, path in reversed(missing):
+            hashes['dir_table'].append((None if head is None else index[head], name))
+            hashes['dir_paths'].append(path)
+            index[path] = len(hashes['dir_table']) - 1
+        return index[path]
+
+    @staticmethod
+    def dir_path(hashes: dict, dir_id: int) -> str:
+        """
+        Rebuild the path of a directory from its id.
+
+        Args:
+            hashes (dict): The hashes structure.
+            dir_id (int): The id of the directory.
+        Returns:
+            str: The path to the directory.
+        """
+
+        HashStore._dir_index(hashes)
+        return hashes['dir_paths'][dir_id]
+
+    @staticmethod
+    def file_key(hashes: dict, path: str, create: bool = False) -> tuple:
+        """
+        Split a file path into the (dir_id, name) key its record is stored under.
+
+        Args:
+            hashes (dict): The hashes structure.
+            path (str): The path to the file.
+            create (bool, optional): If True, add the parent directory to the table. Defaults to False.
+        Returns:
+            tuple: The (dir_id, name) key; dir_id is None if the parent directory is unknown.
+        """
+
+        head, name = os.path.split(path)
+        return HashStore.dir_id(hashes, head, create=create), name
+
+    @staticmethod
+    def file_path(hashes: dict, key: tuple) -> str:
+        """
+        Rebuild the path of a file from its (dir_id, name) key.
+
+        Args:
+            hashes (dict): The hashes structure.
+            key (tuple): The key of the file.
+        Returns:
+            str: The path to the file.
+        """
+
+        dir_id, name = key
+        return os.path.join(HashStore.dir_path(hashes, dir_id), name)
+
+    @staticmethod
+    def _group(hashes: dict, kind: str, key, hash_value: bytes) -> None:
+        """
+        Add a file or directory to the group of the given hash.
+
+        Most hashes are unique, so a group of one is stored as the bare key and
+        only becomes a dict, used as an ordered set, once a second member joins.
+
+        Args:
+            hashes (dict): The hashes structure to update in place.
+            kind (str): Either 'files' or 'dirs'.
+            key: The (dir_id, name) key of a file, or the id of a directory.
+            hash_value (bytes): The hash to group it under.
+        """
+
+        groups = hashes[kind]
+        group = groups.get(hash_value)
+        if group is None:
+            groups[hash_value] = key
+        elif isinstance(group, dict):
+            group[key] = None
+        elif group != key:
+            groups[hash_value] = {group: None, key: None}
+
+    @staticmethod
+    def _ungroup(hashes: dict, kind: str, key, hash_value: bytes) -> None:
+        """
+        Take a file or directory out of the group of the given hash.
+
+        Args:
+            hashes (dict): The hashes structure to update in place.
+            kind (str): Either 'files' or 'dirs'.
+            key: The (dir_id, name) key of a file, or the id of a directory.
+            hash_value (bytes): The hash it is grouped under.
+        """
+
+        groups = hashes[kind]
+        group = groups.get(hash_value)
+        if isinstance(group, dict):
+            group.pop(key, None)
+            if len(group) == 1:
+                groups[hash_value] = next(iter(group))
+        elif group == key:
+            del groups[hash_value]
+
+    @staticmethod
+    def _drop_record(hashes: dict, dir_id: int, name: str) -> None:
+        """Delete a file record, and the record table of its directory once empty."""
+
+        records = hashes['records'][dir_id]
+        del records[name]
+        if not records:
+            del hashes['records'][dir_id]
+
+    @staticmethod
+    def _remove_path(hashes: dict, path: str) -> None:
+        """
+        Forget everything recorded about a path.
+
+        Args:
+            hashes (dict): The hashes structure to update in place.
+            path (str): The path to forget.
+        """
+
+        dir_id, name = HashStore.file_key(hashes, path)
+        old = hashes['records'].get(dir_id, {}).get(name)
+        if old is not None:
+            if old[0] is not None:
+                HashStore._ungroup(hashes, 'files', (dir_id, name), old[0])
+            HashStore._drop_record(hashes, dir_id, name)
+
+        dir_id = HashStore.dir_id(hashes, path)
+        old = hashes['tree'].pop(dir_id, None)
+        if old is not None:
+            HashStore._ungroup(hashes, 'dirs', dir_id, old[0])
+
+    @staticmethod
+    def _move_path(hashes: dict, old_path: str, new_path: str) -> None:
+        """
+        Record everything known about a path under a new path instead.
+
+        Entries below a moved directory keep their own paths. Nothing happens
+        if the old path is not catalogued, so replaying a move that is already
+        applied keeps the entry under its new path.
+
+        Args:
+            hashes (dict): The hashes structure to update in place.
+            old_path (str): The current path.
+            new_path (str): The path to move the entries to.
+        """
+
+        if old_path == new_path:
+            return
+
+        dir_id, name = HashStore.file_key(hashes, old_path)
+        old = hashes['records'].get(dir_id, {}).get(name)
+        if old is not None:
+            HashStore._remove_path(hashes, new_path)
+            HashStore._remove_path(hashes, old_path)
+            key = new_dir_id, new_name = HashStore.file_key(hashes, new_path, create=True)
+            hashes['records'].setdefault(new_dir_id, {})[new_name] = old
+            if old[0] is not None:
+                HashStore._group(hashes, 'files', key, old[0])
+            return
+
+        old = hashes['tree'].get(HashStore.dir_id(hashes, old_path))
+        if old is not None:
+            HashStore._remove_path(hashes, new_path)
+            HashStore._remove_path(hashes, old_path)
+            new_dir_id = HashStore.dir_id(hashes, new_path, create=True)
+            hashes['tree'][new_dir_id] = old
+            HashStore._group(hashes, 'dirs', new_dir_id, old[0])
+
+    @staticmethod
+    def upgrade_hashes(hashes: dict) -> dict:
+        """
+        Bring a hashes structure written by an older version to the current format.
+
+        Snapshots keyed by full path strings are converted to the directory table
+        layout; newer snapshots only get the keys they are missing.
+
+        Args:
+            hashes (dict): The hashes structure.
+        Returns:
+            dict: The upgraded hashes structure, which may be a new object.
+        """
+
+        if 'dir_table' in hashes:
+            for key, value in EMPTY_HASHES_PICKLE.items():
+                hashes.setdefault(key, copy.deepcopy(value))
+            return hashes
+
+        upgraded = HashHelper.empty_hashes()
+        for record in HashStore.exchange_records(hashes):
+            HashStore.apply_record(upgraded, record)
+        return upgraded
+
+    @staticmethod
+    def exchange_records(hashes: dict):
+        """
+        Turn a path-keyed hashes structure, as exported or imported, into journal records.
+
+        Groups come first and the 'stats' and 'tree' entries after them, so the
+        hash recorded along with a fingerprint wins when an old snapshot lists a
+        path under several hashes.
+
+        Args:
+            hashes (dict): A {'files', 'dirs', 'stats', 'unhashed', 'meta', 'tree'} structure.
+        Yields:
+            tuple: Journal records, as applied by apply_record.
+        """
+
+        for kind in ('files', 'dirs'):
+            for digest, paths in hashes[kind].items():
+                for path in paths:
+                    yield kind, digest, path
+        for path, (fingerprint, digest) in hashes.get('stats', {}).items():
+            yield 'files', digest, path, fingerprint
+        for path, fingerprint in hashes.get('unhashed', {}).items():
+            yield 'unhashed', None, path, fingerprint
+        for path, (fingerprint, children, digest) in hashes.get('tree', {}).items():
+            yield 'dirs', digest, path, fingerprint, children
+        for key, value in hashes.get('meta', {}).items():
+            yield 'meta', value, key
+
+    @staticmethod
+    def replay_journal(hashes: dict, verbose: bool = False, logger=None) -> int:
+        """
+        Replay the journal on top of a loaded snapshot.
+
+        A torn record at the end of the journal (e.g. after a crash mid-write)
+        ends the replay; every complete record before it is applied, and the
+        journal is cut back to them, so records appended by the next run are
+        not lost behind the torn one.
+
+        Args:
+            hashes (dict): The hashes structure to update in place.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            int: The number of records replayed.
+        """
+
+        replayed = 0
+        # Offset just past the last record that was applied
+        good = 0
+
+        if not os.path.exists(HASHES_JOURNAL_PATH):
+            return replayed
+
+        try:
+            with open(HASHES_JOURNAL_PATH, 'rb') as f:
+                while True:
+                    try:
+                        record = pickle.load(f)
+                    except EOFError:
+                        break
+                    HashStore.apply_record(hashes, record)
+                    replayed += 1
+                    good = f.tell()
+                # A record cut short can also end in EOFError
+                error = "torn record" if os.fstat(f.fileno()).st_size > good else None
+        except (pickle.PickleError, ValueError, TypeError, KeyError, EOFError) as e:
+            error = str(e)
+        except OSError as e:
+            if logger:
+                logger.warning(f"Cannot read journal: {str(e)}")
+            elif verbose:
+                print(f"Cannot read journal: {str(e)}")
+            return replayed
+
+        if error is None:
+            return replayed
+
+        if logger:
+            logger.warning(f"Journal truncated after {replayed} records: {error}")
+        elif verbose:
+            print(f"Journal truncated after {replayed} records: {error}")
+        try:
+            os.truncate(HASHES_JOURNAL_PATH, good)
+        except OSError as e:
+            if logger:
+                logger.warning(f"Cannot cut torn record from journal: {str(e)}")
+            elif verbose:
+                print(f"Cannot cut torn record from journal: {str(e)}")
+
+        return replayed
+
+    @staticmethod
+    def exported(catalog: dict) -> dict:
+        """
+        Convert a hashes structure to the path-keyed layout used by exports and imports.
+
+        Args:
+            catalog (dict): The hashes structure, in the directory table layout.
+        Returns:
+            dict: A {'files', 'dirs', 'stats', 'unhashed', 'meta', 'tree'} structure keyed by full paths.
+        """
+        hashes = {'files': {}, 'dirs': {}, 'stats': {}, 'unhashed': {}, 'meta': dict(catalog['meta']), 'tree': {}}
+        for dir_id, records in catalog['records'].items():
+            dir_path = HashStore.dir_path(catalog, dir_id)
+            for name, (digest, *fingerprint) in records.items():
+                path = os.path.join(dir_path, name)
+                fingerprint = tuple(fingerprint) if fingerprint[3] is not None else None
+                if digest is None:
+                    hashes['unhashed'][path] = fingerprint
+                    continue
+                hashes['files'].setdefault(digest, []).append(path)
+                if fingerprint is not None:
+                    hashes['stats'][path] = (fingerprint, digest)
+        for dir_id, (digest, fingerprint, children) in catalog['tree'].items():
+            path = HashStore.dir_path(catalog, dir_id)
+            hashes['dirs'].setdefault(digest, []).append(path)
+            if fingerprint is not None:
+                hashes['tree'][path] = (fingerprint, children, digest)
+        return hashes
+
+    @staticmethod
+    def snapshot(hashes: dict) -> dict:
+        """
+        Select the part of a hashes structure that is saved.
+
+        The in-memory directory path index is rebuilt from the table on load.
+
+        Args:
+            hashes (dict): The hashes structure.
+        Returns:
+            dict: The structure without its path index.
+        """
+
+        return {key: value for key, value in hashes.items() if key not in ('dir_index', 'dir_paths')}
+
+
+def open_store(backend: str = DEFAULT_BACKEND, verbose: bool = False, logger=None):
+    """
+    Open the hash catalog for the given backend.
+
+    When the SQLite catalog does not exist yet but a pickle catalog does, e.g.
+    from a version that defaulted to the pickle backend, the pickle catalog is
+    imported into the new database, so switching backends keeps the hashes.
+    The pickle files are left in place.
+
+    Args:
+        backend (str, optional): Either 'sqlite' or 'pickle'. Defaults to DEFAULT_BACKEND.
+        verbose (bool, optional): If True, print verbose output. Defaults to False.
+        logger: Logger instance for logging messages.
+    Returns:
+        The opened store, a SqliteHashStore or a HashStore.
+    """
+    if backend == 'sqlite':
+        created = not os.path.exists(HASHES_DB_PATH)
+        store = SqliteHashStore(verbose=verbose, logger=logger)
+        if created and os.path.exists(HASHES_PICKLE_PATH):
+            import_pickle_catalog(store, verbose=verbose, logger=logger)
+        return store
+    if backend == 'pickle':
+        return HashStore(verbose=verbose, logger=logger)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def import_pickle_catalog(store, verbose: bool = False, logger=None) -> int:
+    """
+    Copy the pickle catalog, snapshot and journal, into another store.
+
+    Args:
+        store: The store to import into, e.g. a new SqliteHashStore.
+        verbose (bool, optional): If True, print verbose output. Defaults to False.
+        logger: Logger instance for logging messages.
+    Returns:
+        int: The number of paths imported.
+    """
+    legacy = HashStore(verbose=verbose, logger=logger)
+    try:
+        if legacy.is_empty():
+            return 0
+        imported = store.import_hashes(legacy.export_hashes())
+    finally:
+        legacy.close()
+
+    if logger:
+        logger.info(f"Imported {imported} paths from {HASHES_PICKLE_PATH} into {store.location}")
+    elif verbose:
+        print(f"Imported {imported} paths from {HASHES_PICKLE_PATH} into {store.location}")
+    return imported
+
+
+def catalog_algorithm(store) -> Optional[str]:
+    """
+    Find the digest algorithm a catalog was built with.
+
+    Args:
+        store: An opened store, as returned by open_store.
+    Returns:
+        str: The recorded algorithm, DEFAULT_ALGORITHM for catalogs built before it
+            was recorded, or None if the catalog is empty and can use any algorithm.
+    """
+    algorithm = store.get_meta('algorithm')
+    if algorithm is None and not store.is_empty():
+        return DEFAULT_ALGORITHM
+    return algorithm
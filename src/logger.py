@@ -98,6 +98,20 @@ class Logger:
                 self.progress.update(task_id, advance=advance)
             self._update_display()
             
+    def grow_task(self, task_id: int, amount: int):
+        """
+        Increase the total of a progress task, e.g. as more items are discovered.
+        
+        Args:
+            task_id (int): Task ID to update
+            amount (int): Number of items to add to the total
+        """
+        if self.progress and task_id is not None and amount:
+            task = next(task for task in self.progress.tasks if task.id == task_id)
+            total = task.total or 0
+            self.progress.update(task_id, total=total + amount)
+            self._update_display()
+            
     def _update_display(self):
         """Update the live display with current progress and logs."""
         if self.layout and self.progress:
@@ -0,0 +1,170 @@
+import os
+import re
+import copy
+from src.constants import IGNORE_FILE_NAME
+
+class PathFilter:
+    """
+    Include and exclude glob patterns, compiled into a single matcher.
+
+    Patterns follow a subset of the .gitignore syntax:
+    - A pattern without a slash matches entry names at any depth.
+    - A pattern with a slash matches paths relative to the directory it was
+      given for: the scan root, or the directory holding a .dupesignore file.
+    - A trailing slash restricts a pattern to directories.
+    - '*' and '?' do not match a slash, '**' matches anything, and '**/'
+      matches any number of directories, including none.
+
+    Excluded directories are pruned by the walkers, so they are never listed.
+    Include patterns, when given, restrict the files that are hashed, while
+    directories are still descended unless they are excluded.
+    """
+
+    def __init__(self, base: str, exclude: tuple = (), include: tuple = ()):
+        """
+        Args:
+            base (str): The directory that patterns containing a slash are relative to.
+            exclude (tuple, optional): Glob patterns of files and directories to leave out.
+            include (tuple, optional): Glob patterns of the files to hash; all files if empty.
+        """
+        self.exclude = tuple((base, pattern) for pattern in exclude)
+        self.include = tuple((base, pattern) for pattern in include)
+        self._excluded = PathFilter._compile(self.exclude)
+        self._included = PathFilter._compile(self.include)
+
+    @staticmethod
+    def _translate(pattern: str) -> str:
+        """
+        Translate a glob pattern into a regular expression, without anchors.
+
+        Args:
+            pattern (str): The glob pattern.
+        Returns:
+            str: The regular expression.
+        """
+        parts = []
+        i = 0
+        while i < len(pattern):
+            char = pattern[i]
+            if pattern.startswith('**/', i):
+                parts.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern.startswith('**', i):
+                parts.append('.*')
+                i += 2
+                continue
+            if char == '*':
+                parts.append('[^/]*')
+            elif char == '?':
+                parts.append('[^/]')
+            elif char == '[' and pattern.find(']', i + 2) != -1:
+                end = pattern.find(']', i + 2)
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                parts.append('[^' + body[1:] + ']' if body.startswith('!') else '[' + body + ']')
+                i = end + 1
+                continue
+            else:
+                parts.append(re.escape(char))
+            i += 1
+        return ''.join(parts)
+
+    @staticmethod
+    def _compile(patterns: tuple):
+        """
+        Compile (base, pattern) pairs into one regular expression.
+
+        The expression is matched against an entry's path, with a trailing
+        slash appended for directories.
+
+        Args:
+            patterns (tuple): (base, pattern) pairs.
+        Returns:
+            re.Pattern: The compiled expression, or None if there are no patterns.
+        """
+        alternatives = []
+        for base, pattern in patterns:
+            suffix = '/' if pattern.endswith('/') else '/?'
+            pattern = pattern.rstrip('/')
+            if not pattern:
+                continue
+            if '/' in pattern:
+                prefix = '^' + re.escape(base.rstrip('/')) + '/'
+                pattern = pattern.lstrip('/')
+            else:
+                prefix = '(?:^|/)'
+            alternatives.append(prefix + PathFilter._translate(pattern) + suffix + r'\Z')
+
+        if not alternatives:
+            return None
+        return re.compile('|'.join(f'(?:{alternative})' for alternative in alternatives), re.DOTALL)
+
+    def skips(self, path: str, is_dir: bool) -> bool:
+        """
+        Check whether an entry is left out of the scan.
+
+        Args:
+            path (str): The path to the entry.
+            is_dir (bool): Whether the entry is a directory.
+        Returns:
+            bool: True if the entry is excluded, or is a file that no include pattern matches.
+        """
+        if is_dir:
+            return self._excluded is not None and self._excluded.search(path + '/') is not None
+        if self._excluded is not None and self._excluded.search(path) is not None:
+            return True
+        return self._included is not None and self._included.search(path) is None
+
+    def enter(self, dir_path: str, entries: list, verbose: bool = False, logger=None) -> 'PathFilter':
+        """
+        Get the filter that applies inside a directory.
+
+        If the directory holds a .dupesignore file, its patterns are added to
+        the exclude patterns, relative to the directory.
+
+        Args:
+            dir_path (str): The path to the directory.
+            entries (list): The entries of the directory, as listed by the walker.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            PathFilter: This filter, or a new one with the patterns of the ignore file.
+        """
+        if not any(entry.name == IGNORE_FILE_NAME for entry in entries):
+            return self
+
+        path = os.path.join(dir_path, IGNORE_FILE_NAME)
+        patterns = PathFilter.read_ignore_file(path, verbose=verbose, logger=logger)
+        if not patterns:
+            return self
+
+        child = copy.copy(self)
+        child.exclude = self.exclude + tuple((dir_path, pattern) for pattern in patterns)
+        child._excluded = PathFilter._compile(child.exclude)
+        return child
+
+    @staticmethod
+    def read_ignore_file(path: str, verbose: bool = False, logger=None) -> list:
+        """
+        Read the patterns of an ignore file, one per line.
+
+        Blank lines and lines starting with '#' are ignored.
+
+        Args:
+            path (str): The path to the ignore file.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            list: The patterns, or an empty list if the file cannot be read.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+                lines = [line.strip() for line in f]
+        except (PermissionError, OSError) as e:
+            if logger:
+                logger.warning(f"Cannot read ignore file: {path} - {str(e)}")
+            elif verbose:
+                print(f"Cannot read ignore file: {path} - {str(e)}")
+            return []
+
+        return [line for line in lines if line and not line.startswith('#')]
@@ -0,0 +1,139 @@
+import os
+import pickle
+from typing import Optional
+from src.constants import SCAN_STATE_PATH
+from src.constants import SCAN_CANDIDATES_PATH
+
+class ScanState:
+    """
+    Checkpoint of a process-dir run, from which an interrupted run can be resumed.
+
+    The state holds the scan options, the roots that are not finished yet (the
+    first one being in progress) and, once the first checkpoint is taken, the
+    traversal stack of the root in progress: for each open directory, the
+    entries still to visit and the hashes of the entries already visited.
+    Finished roots and finished subtrees are only represented by their hashes,
+    so a resumed run does not walk them again.
+
+    The set of files selected by the size prefilter does not change during a
+    run; it is saved once, in a file of its own.
+    """
+
+    def __init__(self, roots: list, options: dict):
+        """
+        Args:
+            roots (list): The directories to scan, in order.
+            options (dict): The scan options, as passed to Dupes, plus 'backend' and
+                'size_prefilter'.
+        """
+        self.roots = list(roots)
+        self.options = dict(options)
+        self.stack = None
+        self.visited = None
+
+    @staticmethod
+    def load(verbose: bool = False, logger=None) -> Optional['ScanState']:
+        """
+        Load the state left by an interrupted run.
+
+        Args:
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            ScanState: The saved state, or None if there is none or it cannot be read.
+        """
+        try:
+            with open(SCAN_STATE_PATH, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            if logger:
+                logger.warning(f"Cannot read scan state: {SCAN_STATE_PATH} - {str(e)}")
+            elif verbose:
+                print(f"Cannot read scan state: {SCAN_STATE_PATH} - {str(e)}")
+            return None
+
+        return state if isinstance(state, ScanState) else None
+
+    def save(self, verbose: bool = False, logger=None) -> bool:
+        """
+        Write the state, replacing the previous checkpoint atomically.
+
+        Args:
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        return ScanState._write(SCAN_STATE_PATH, self, verbose=verbose, logger=logger)
+
+    def save_candidates(self, candidates: set, verbose: bool = False, logger=None) -> bool:
+        """
+        Write the files selected by the size prefilter.
+
+        Args:
+            candidates (set): The paths of the files to hash.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        return ScanState._write(SCAN_CANDIDATES_PATH, candidates, verbose=verbose, logger=logger)
+
+    def load_candidates(self, verbose: bool = False, logger=None) -> Optional[set]:
+        """
+        Read the files selected by the size prefilter of the interrupted run.
+
+        Args:
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            set: The paths of the files to hash, or None if they cannot be read.
+        """
+        try:
+            with open(SCAN_CANDIDATES_PATH, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            if logger:
+                logger.warning(f"Cannot read prefilter candidates: {SCAN_CANDIDATES_PATH} - {str(e)}")
+            elif verbose:
+                print(f"Cannot read prefilter candidates: {SCAN_CANDIDATES_PATH} - {str(e)}")
+            return None
+
+    @staticmethod
+    def _write(path: str, value, verbose: bool = False, logger=None) -> bool:
+        """
+        Pickle a value to a temporary file and move it over the given path.
+
+        Args:
+            path (str): The destination path.
+            value: The value to pickle.
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            return True
+        except (OSError, pickle.PicklingError) as e:
+            if logger:
+                logger.warning(f"Cannot save scan state: {path} - {str(e)}")
+            elif verbose:
+                print(f"Cannot save scan state: {path} - {str(e)}")
+            return False
+
+    @staticmethod
+    def clear() -> None:
+        """Remove the saved state, e.g. once a run has finished."""
+        for path in (SCAN_STATE_PATH, SCAN_CANDIDATES_PATH):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
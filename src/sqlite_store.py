@@ -0,0 +1,424 @@
+import json
+import sqlite3
+from itertools import groupby
+from typing import Optional
+from src.hash_helper import HashHelper
+from src.constants import HASHES_DB_PATH
+from src.constants import SQLITE_BATCH_SIZE
+
+class SqliteHashStore:
+    """
+    A hash catalog backed by a SQLite database.
+
+    Files and directories live in separate tables indexed by digest, path and
+    size, so commands query only the rows they need instead of loading the
+    whole catalog. Digests are stored as raw bytes. Writes are grouped into
+    batched transactions and the database runs in WAL mode.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS files ("
+        " path TEXT PRIMARY KEY,"
+        " digest BLOB NOT NULL,"
+        " size INTEGER,"
+        " dev INTEGER,"
+        " ino INTEGER,"
+        " mtime_ns INTEGER"
+        ")",
+        "CREATE INDEX IF NOT EXISTS files_digest ON files (digest)",
+        "CREATE INDEX IF NOT EXISTS files_size ON files (size)",
+        "CREATE TABLE IF NOT EXISTS dirs ("
+        " path TEXT PRIMARY KEY,"
+        " digest BLOB NOT NULL,"
+        " dev INTEGER,"
+        " ino INTEGER,"
+        " mtime_ns INTEGER,"
+        " children TEXT"
+        ")",
+        "CREATE INDEX IF NOT EXISTS dirs_digest ON dirs (digest)",
+        "CREATE TABLE IF NOT EXISTS unhashed ("
+        " path TEXT PRIMARY KEY,"
+        " size INTEGER NOT NULL,"
+        " dev INTEGER,"
+        " ino INTEGER,"
+        " mtime_ns INTEGER"
+        ")",
+        "CREATE INDEX IF NOT EXISTS unhashed_size ON unhashed (size)",
+        "CREATE TABLE IF NOT EXISTS meta ("
+        " key TEXT PRIMARY KEY,"
+        " value TEXT"
+        ")",
+    )
+
+    # Columns added to existing tables after their first release
+    MIGRATIONS = {
+        'files': (('dev', 'INTEGER'), ('ino', 'INTEGER'), ('mtime_ns', 'INTEGER')),
+        'dirs': (('dev', 'INTEGER'), ('ino', 'INTEGER'), ('mtime_ns', 'INTEGER'), ('children', 'TEXT')),
+    }
+
+    def __init__(
+        self,
+        verbose: bool = False,
+        logger=None,
+        db_path: str = HASHES_DB_PATH,
+        batch_size: int = SQLITE_BATCH_SIZE,
+    ):
+        """
+        Open (and if needed create) the catalog database.
+
+        Args:
+            verbose (bool, optional): If True, print verbose output. Defaults to False.
+            logger: Logger instance for logging messages.
+            db_path (str, optional): Path to the SQLite database file.
+            batch_size (int, optional): Number of writes per transaction.
+        """
+        self.verbose = verbose
+        self.logger = logger
+        self.location = db_path
+        self.batch_size = batch_size
+        self._pending = 0
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in self.SCHEMA:
+            self.conn.execute(statement)
+        self._migrate()
+        if self.get_meta('digests') != 'binary':
+            self._binary_digests()
+        self.conn.commit()
+
+    def _migrate(self) -> None:
+        """Add any columns missing from a database created by an older version."""
+        for table, columns in self.MIGRATIONS.items():
+            existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for name, column_type in columns:
+                if name not in existing:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    def _binary_digests(self) -> None:
+        """Convert the hex digests of a database created by an older version to raw bytes."""
+        for table in ('files', 'dirs'):
+            rows = self.conn.execute(
+                f"SELECT path, digest FROM {table} WHERE typeof(digest) = 'text'"
+            ).fetchall()
+            self.conn.executemany(
+                f"UPDATE {table} SET digest = ? WHERE path = ?",
+                ((bytes.fromhex(digest), path) for path, digest in rows),
+            )
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('digests', 'binary')")
+
+    def _write(self, sql: str, params: tuple) -> None:
+        """
+        Execute a write inside the current batch, committing when it is full.
+
+        Args:
+            sql (str): The statement to execute.
+            params (tuple): The statement parameters.
+        """
+        self.conn.execute(sql, params)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.checkpoint()
+
+    def add_file(self, file_hash: bytes, path: str, fingerprint: tuple = None) -> None:
+        """Record the hash of a file along with its stat fingerprint."""
+        dev, ino, size, mtime_ns = fingerprint if fingerprint is not None else (None,) * 4
+        self._write(
+            "INSERT OR REPLACE INTO files (path, digest, size, dev, ino, mtime_ns)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (path, file_hash, size, dev, ino, mtime_ns),
+        )
+        self._write("DELETE FROM unhashed WHERE path = ?", (path,))
+
+    def remove_path(self, path: str) -> None:
+        """Forget a file or directory, e.g. one that no longer exists."""
+        for table in ('files', 'dirs', 'unhashed'):
+            self._write(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def move_path(self, old_path: str, new_path: str) -> None:
+        """Record what is known about a file or directory under its new path; a no-op if old_path is unknown."""
+        if old_path == new_path:
+            return
+        known = self.conn.execute(
+            "SELECT 1 FROM files WHERE path = ? UNION ALL SELECT 1 FROM dirs WHERE path = ?"
+            " UNION ALL SELECT 1 FROM unhashed WHERE path = ? LIMIT 1",
+            (old_path, old_path, old_path),
+        ).fetchone()
+        if known is None:
+            return
+        self.remove_path(new_path)
+        for table in ('files', 'dirs', 'unhashed'):
+            self._write(f"UPDATE {table} SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def add_unhashed(self, path: str, fingerprint: tuple) -> None:
+        """Record a file that was skipped by the size prefilter."""
+        dev, ino, size, mtime_ns = fingerprint
+        self._write(
+            "INSERT OR REPLACE INTO unhashed (path, size, dev, ino, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            (path, size, dev, ino, mtime_ns),
+        )
+
+    def remove_unhashed(self, path: str) -> None:
+        """Forget a file that was skipped by the size prefilter."""
+        self._write("DELETE FROM unhashed WHERE path = ?", (path,))
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Read a catalog setting, or None if it was never set."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """Record a catalog setting."""
+        self._write("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def is_empty(self) -> bool:
+        """Check whether the catalog holds no file or directory."""
+        row = self.conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM files) OR EXISTS (SELECT 1 FROM dirs)"
+            " OR EXISTS (SELECT 1 FROM unhashed)"
+        ).fetchone()
+        return not row[0]
+
+    def paths_with_size(self, size: int) -> list:
+        """
+        List the catalogued files, hashed or not, that have the given size.
+
+        Args:
+            size (int): The file size in bytes.
+        Returns:
+            list: The matching paths.
+        """
+        rows = self.conn.execute(
+            "SELECT path FROM files WHERE size = ? UNION SELECT path FROM unhashed WHERE size = ?",
+            (size, size),
+        )
+        return [path for (path,) in rows]
+
+    def unhashed_with_size(self, size: int) -> list:
+        """
+        List the files skipped by the size prefilter that have the given size.
+
+        Args:
+            size (int): The file size in bytes.
+        Returns:
+            list: (path, fingerprint) pairs.
+        """
+        rows = self.conn.execute(
+            "SELECT path, dev, ino, size, mtime_ns FROM unhashed WHERE size = ?", (size,)
+        )
+        return [(path, tuple(fingerprint)) for path, *fingerprint in rows]
+
+    def get_file(self, path: str) -> Optional[tuple]:
+        """
+        Look up the stored hash of a file.
+
+        Args:
+            path (str): The path to the file.
+        Returns:
+            tuple: A (hash, fingerprint) pair, or None if the file has no fingerprint stored.
+        """
+        row = self.conn.execute(
+            "SELECT digest, dev, ino, size, mtime_ns FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or row[4] is None:
+            return None
+        return row[0], tuple(row[1:])
+
+    def add_dir(self, dir_hash: bytes, path: str, fingerprint: tuple = None, children: tuple = None) -> None:
+        """Record the hash of a directory along with its stat fingerprint and entry names."""
+        dev, ino, mtime_ns = fingerprint if fingerprint is not None else (None,) * 3
+        self._write(
+            "INSERT OR REPLACE INTO dirs (path, digest, dev, ino, mtime_ns, children)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (path, dir_hash, dev, ino, mtime_ns, json.dumps(list(children)) if fingerprint is not None else None),
+        )
+
+    def get_dir(self, path: str) -> Optional[tuple]:
+        """
+        Look up the stored hash and listing of a directory.
+
+        Args:
+            path (str): The path to the directory.
+        Returns:
+            tuple: A (hash, fingerprint, children) tuple, or None if the directory has no
+                fingerprint stored.
+        """
+        row = self.conn.execute(
+            "SELECT digest, dev, ino, mtime_ns, children FROM dirs WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or row[4] is None:
+            return None
+        return row[0], tuple(row[1:4]), tuple(json.loads(row[4]))
+
+    def entries(self) -> list:
+        """
+        List every catalogued path with what is needed to check it is still current.
+
+        Returns:
+            list: (kind, path, fingerprint) tuples, where kind is 'files' or 'dirs' and
+                fingerprint is None for entries recorded without one. Unhashed files are
+                listed as 'files'.
+        """
+        entries = []
+        queries = (
+            ('files', "SELECT path, dev, ino, size, mtime_ns FROM files"),
+            ('files', "SELECT path, dev, ino, size, mtime_ns FROM unhashed"),
+            ('dirs', "SELECT path, dev, ino, mtime_ns FROM dirs"),
+        )
+        for kind, sql in queries:
+            for path, *fingerprint in self.conn.execute(sql):
+                fingerprint = tuple(fingerprint) if fingerprint[-1] is not None else None
+                entries.append((kind, path, fingerprint))
+        return entries
+
+    def duplicates(self, kind: str):
+        """
+        Yield groups of paths that share a digest.
+
+        Only rows belonging to duplicate groups are read from the database.
+
+        Args:
+            kind (str): Either 'files' or 'dirs'.
+        Yields:
+            tuple: A (digest, list of paths) pair per duplicate group.
+        """
+        if kind not in ('files', 'dirs'):
+            raise ValueError(f"Unknown catalog kind: {kind}")
+
+        rows = self.conn.execute(
+            f"SELECT digest, path FROM {kind} WHERE digest IN ("
+            f" SELECT digest FROM {kind} GROUP BY digest HAVING COUNT(*) > 1"
+            f") ORDER BY digest, path"
+        )
+        for digest, group in groupby(rows, key=lambda row: row[0]):
+            yield digest, [path for _, path in group]
+
+    def duplicate_files(self):
+        """
+        Yield the files that share their digest with another file.
+
+        Yields:
+            tuple: A (path, digest, fingerprint) tuple per file; fingerprint is None
+                for files recorded without one.
+        """
+        rows = self.conn.execute(
+            "SELECT path, digest, dev, ino, size, mtime_ns FROM files WHERE digest IN ("
+            " SELECT digest FROM files GROUP BY digest HAVING COUNT(*) > 1"
+            ") ORDER BY path"
+        )
+        for path, digest, *fingerprint in rows:
+            yield path, digest, tuple(fingerprint) if fingerprint[3] is not None else None
+
+    def checkpoint(self) -> bool:
+        """
+        Commit the current batch of writes.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        try:
+            self.conn.commit()
+            self._pending = 0
+            return True
+        except sqlite3.Error as e:
+            if self.logger:
+                self.logger.error(f"Cannot commit hashes: {str(e)}")
+            elif self.verbose:
+                print(f"Cannot commit hashes: {str(e)}")
+            return False
+
+    def clear(self) -> bool:
+        """
+        Remove every file and directory from the catalog.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        try:
+            self.conn.execute("DELETE FROM files")
+            self.conn.execute("DELETE FROM dirs")
+            self.conn.execute("DELETE FROM unhashed")
+            self.conn.execute("DELETE FROM meta")
+            self._binary_digests()
+            return self.checkpoint()
+        except sqlite3.Error as e:
+            if self.logger:
+                self.logger.error(f"Error clearing hashes: {str(e)}")
+            elif self.verbose:
+                print(f"Error clearing hashes: {str(e)}")
+            return False
+
+    def import_hashes(self, hashes: dict) -> int:
+        """
+        Import a {'files', 'dirs', 'stats', 'unhashed', 'meta', 'tree'} hashes structure, e.g. from a pickle.
+
+        Args:
+            hashes (dict): The hashes structure to import.
+        Returns:
+            int: The number of paths imported.
+        """
+        imported = 0
+        for kind in ('files', 'dirs'):
+            for digest, paths in hashes[kind].items():
+                digest = HashHelper.digest_bytes(digest)
+                for path in paths:
+                    if kind == 'files':
+                        self.add_file(digest, path)
+                    else:
+                        self.add_dir(digest, path)
+                    imported += 1
+        for path, (fingerprint, digest) in hashes.get('stats', {}).items():
+            self.add_file(HashHelper.digest_bytes(digest), path, fingerprint)
+        for path, fingerprint in hashes.get('unhashed', {}).items():
+            self.add_unhashed(path, fingerprint)
+        for path, (fingerprint, children, digest) in hashes.get('tree', {}).items():
+            self.add_dir(HashHelper.digest_bytes(digest), path, fingerprint, children)
+        for key, value in hashes.get('meta', {}).items():
+            self.set_meta(key, value)
+        self.checkpoint()
+        return imported
+
+    def export_hashes(self) -> dict:
+        """
+        Export the catalog as a {'files', 'dirs', 'stats', 'unhashed', 'meta', 'tree'} hashes structure.
+
+        Returns:
+            dict: The hashes structure, in the same format as the pickle.
+        """
+        hashes = {'files': {}, 'dirs': {}, 'stats': {}, 'unhashed': {}, 'meta': {}, 'tree': {}}
+        for kind in ('files', 'dirs'):
+            for digest, path in self.conn.execute(f"SELECT digest, path FROM {kind}"):
+                hashes[kind].setdefault(digest, []).append(path)
+        rows = self.conn.execute(
+            "SELECT path, digest, dev, ino, size, mtime_ns FROM files WHERE mtime_ns IS NOT NULL"
+        )
+        for path, digest, *fingerprint in rows:
+            hashes['stats'][path] = (tuple(fingerprint), digest)
+        rows = self.conn.execute("SELECT path, dev, ino, size, mtime_ns FROM unhashed")
+        for path, *fingerprint in rows:
+            hashes['unhashed'][path] = tuple(fingerprint)
+        rows = self.conn.execute(
+            "SELECT path, digest, dev, ino, mtime_ns, children FROM dirs WHERE children IS NOT NULL"
+        )
+        for path, digest, dev, ino, mtime_ns, children in rows:
+            hashes['tree'][path] = ((dev, ino, mtime_ns), tuple(json.loads(children)), digest)
+        for key, value in self.conn.execute("SELECT key, value FROM meta"):
+            hashes['meta'][key] = value
+        return hashes
+
+    def flush(self) -> bool:
+        """
+        Make every record written so far survive the end of the process.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        return self.checkpoint()
+
+    def close(self) -> None:
+        """Commit pending writes and close the database."""
+        if self.conn is not None:
+            self.checkpoint()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,92 @@
+import os
+import time
+import pytest
+from src.dupes import Dupes
+from src.hash_helper import HashHelper
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """
+    A tree whose files have hardlinks in the same directory, in a subdirectory
+    and in a sibling directory, plus a copy of one of them.
+    """
+    monkeypatch.chdir(tmp_path)
+    for directory in ('t/a/sub', 't/b'):
+        os.makedirs(directory)
+    for name in ('f', 'g'):
+        with open(f't/a/{name}', 'w') as f:
+            f.write(name * 1000)
+    os.link('t/a/f', 't/a/f2')
+    os.link('t/a/f', 't/a/sub/f3')
+    os.link('t/a/f', 't/b/f4')
+    os.link('t/a/g', 't/b/g2')
+    with open('t/b/copy', 'w') as f:
+        f.write('f' * 1000)
+    return tmp_path
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """
+    Record the paths read by HashHelper.hash_file, from any thread. Reads are
+    slowed down so that, in a pool, later links are met while the first one is queued.
+    """
+    paths = []
+    hash_file = HashHelper.hash_file
+
+    def counting(path, *args, **kwargs):
+        paths.append(path)
+        time.sleep(0.02)
+        return hash_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(HashHelper, 'hash_file', staticmethod(counting))
+    return paths
+
+
+def scan(**options) -> tuple:
+    """Scan t and return the Dupes instance, the root hash and the catalogued files."""
+    dupes = Dupes(**options)
+    root_hash = dupes.reursive_hash('t')
+    dupes.close()
+    store = Dupes().store
+    files = {path: store.get_file(path)[0] for kind, path, _ in store.entries() if kind == 'files'}
+    store.close()
+    os.remove('hashes.db')
+    return dupes, root_hash, files
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_each_inode_is_read_once(tree, reads, jobs):
+    dupes, _, files = scan(jobs=jobs)
+
+    # One read per inode: f, g and the copy
+    assert sorted(reads) == sorted(set(reads))
+    assert len(reads) == 3
+    assert dupes.hardlink_count == 4
+    assert files['t/a/f'] == files['t/a/f2'] == files['t/a/sub/f3'] == files['t/b/f4'] == files['t/b/copy']
+    assert files['t/a/g'] == files['t/b/g2']
+    assert dupes._links == {}
+
+
+def test_pools_give_the_same_catalog(tree):
+    _, sequential_hash, sequential = scan(jobs=1)
+    _, thread_hash, threads = scan(jobs=4, executor='thread')
+    _, process_hash, processes = scan(jobs=2, executor='process')
+
+    assert sequential_hash == thread_hash == process_hash
+    assert sequential == threads == processes
+
+
+def test_links_free_nothing(tree):
+    dupes = Dupes()
+    dupes.reursive_hash('t')
+    duplicates = dupes.detect_duplicates()
+    dupes.close()
+
+    # g and its link are a single file, so only the group of f is reported
+    assert len(duplicates['files']) == 1
+    digest, paths = next(iter(duplicates['files'].items()))
+    assert sorted(paths) == ['t/a/f', 't/a/f2', 't/a/sub/f3', 't/b/copy', 't/b/f4']
+    assert len(duplicates['links'][digest]) == 3
+    assert duplicates['reclaimable'] == 1000
@@ -0,0 +1,82 @@
+import os
+import shutil
+import pytest
+from src.hash_store import HashStore
+from src.constants import HASHES_JOURNAL_PATH
+
+DIGEST = bytes(range(32))
+OTHER = bytes(range(1, 33))
+
+
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    """Run in an empty directory, where the pickle store keeps its files."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def open_store() -> HashStore:
+    """Open the pickle store without letting it checkpoint on its own."""
+    return HashStore(checkpoint_records=10**6, checkpoint_seconds=10**6)
+
+
+def test_journal_is_replayed_when_the_store_was_not_closed(catalog_dir):
+    store = open_store()
+    store.add_file(DIGEST, 'data/a', (1, 2, 3, 4))
+    store.add_file(OTHER, 'data/b', (1, 3, 3, 4))
+    store.add_dir(DIGEST, 'data', (1, 1, 5), ('a', 'b'))
+    store.remove_path('data/b')
+    # No close: the process died before a checkpoint
+
+    reopened = open_store()
+    assert reopened.get_file('data/a') == (DIGEST, (1, 2, 3, 4))
+    assert reopened.get_file('data/b') is None
+    assert reopened.get_dir('data') == (DIGEST, (1, 1, 5), ('a', 'b'))
+    reopened.close()
+
+
+def test_torn_record_is_cut_from_the_journal(catalog_dir):
+    store = open_store()
+    store.add_file(DIGEST, 'data/a', (1, 2, 3, 4))
+    good = os.path.getsize(HASHES_JOURNAL_PATH)
+    with open(HASHES_JOURNAL_PATH, 'ab') as f:
+        f.write(b'\x80\x05\x95\x30\x00\x00')  # The start of a record, cut short
+
+    reopened = open_store()
+    assert reopened.get_file('data/a') == (DIGEST, (1, 2, 3, 4))
+    assert os.path.getsize(HASHES_JOURNAL_PATH) == good
+
+    # Records appended after the cut are not lost behind the torn one
+    reopened.add_file(OTHER, 'data/b', (1, 3, 3, 4))
+    again = open_store()
+    assert again.get_file('data/a') == (DIGEST, (1, 2, 3, 4))
+    assert again.get_file('data/b') == (OTHER, (1, 3, 3, 4))
+    again.close()
+
+
+def test_journal_replayed_over_its_own_snapshot_is_harmless(catalog_dir):
+    store = open_store()
+    store.add_file(DIGEST, 'data/a', (1, 2, 3, 4))
+    store.move_path('data/a', 'data/c')
+    store.remove_path('data/gone')
+    shutil.copy(HASHES_JOURNAL_PATH, 'journal.copy')
+    store.close()
+    # A crash between writing the snapshot and truncating the journal
+    shutil.copy('journal.copy', HASHES_JOURNAL_PATH)
+
+    reopened = open_store()
+    assert reopened.get_file('data/a') is None
+    assert reopened.get_file('data/c') == (DIGEST, (1, 2, 3, 4))
+    assert list(reopened.duplicates('files')) == []
+    reopened.close()
+
+
+def test_close_checkpoints_and_removes_the_journal(catalog_dir):
+    store = open_store()
+    store.add_file(DIGEST, 'data/a', (1, 2, 3, 4))
+    store.close()
+
+    assert not os.path.exists(HASHES_JOURNAL_PATH)
+    reopened = open_store()
+    assert reopened.get_file('data/a') == (DIGEST, (1, 2, 3, 4))
+    reopened.close()
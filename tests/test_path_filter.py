@@ -0,0 +1,142 @@
+import os
+from src.dupes import Dupes
+from src.path_filter import PathFilter
+from src.constants import IGNORE_FILE_NAME
+
+ROOT = '/scan'
+
+
+def skips(pattern: str, path: str, is_dir: bool = False) -> bool:
+    """Check whether a single exclude pattern, given for ROOT, leaves out ROOT/path."""
+    return PathFilter(ROOT, exclude=(pattern,)).skips(f"{ROOT}/{path}", is_dir)
+
+
+def test_pattern_without_slash_matches_names_at_any_depth():
+    assert skips('*.log', 'x.log')
+    assert skips('*.log', 'a/b/x.log')
+    assert skips('node_modules', 'a/node_modules', is_dir=True)
+    assert not skips('*.log', 'x.log.gz')
+    assert not skips('*.log', 'a/x.log/y', is_dir=True)
+
+
+def test_pattern_with_slash_is_relative_to_its_base():
+    assert skips('build/cache', 'build/cache', is_dir=True)
+    assert skips('build/cache', 'build/cache')
+    assert not skips('build/cache', 'src/build/cache', is_dir=True)
+    assert skips('/build', 'build', is_dir=True)
+    assert not skips('/build', 'a/build', is_dir=True)
+
+
+def test_trailing_slash_only_matches_directories():
+    assert skips('tmp/', 'tmp', is_dir=True)
+    assert skips('tmp/', 'a/tmp', is_dir=True)
+    assert not skips('tmp/', 'tmp')
+    assert not skips('tmp/', 'a/tmp')
+
+
+def test_star_and_question_mark_do_not_match_a_slash():
+    assert skips('a/*.txt', 'a/x.txt')
+    assert not skips('a/*.txt', 'a/b/x.txt')
+    assert skips('f?.txt', 'f1.txt')
+    assert not skips('f?.txt', 'f12.txt')
+    assert not skips('a?b', 'a/b', is_dir=True)
+
+
+def test_double_star_matches_across_directories():
+    assert skips('a/**', 'a/x')
+    assert skips('a/**', 'a/x/y/z')
+    assert skips('logs/**/*.txt', 'logs/x.txt')
+    assert skips('logs/**/*.txt', 'logs/a/b/x.txt')
+    assert not skips('logs/**/*.txt', 'other/logs/x.txt')
+
+
+def test_double_star_slash_matches_zero_directories():
+    assert skips('**/foo', 'foo')
+    assert skips('**/foo', 'a/b/foo')
+    assert skips('**/cache/', 'cache', is_dir=True)
+
+
+def test_character_classes():
+    assert skips('[ab].txt', 'a.txt')
+    assert not skips('[ab].txt', 'c.txt')
+    assert skips('[!a]*.txt', 'b.txt')
+    assert not skips('[!a]*.txt', 'a.txt')
+
+
+def test_include_patterns_only_restrict_files():
+    path_filter = PathFilter(ROOT, include=('*.txt',))
+    assert not path_filter.skips(f"{ROOT}/a.txt", False)
+    assert path_filter.skips(f"{ROOT}/a.bin", False)
+    assert not path_filter.skips(f"{ROOT}/dir", True)
+
+
+def test_exclude_wins_over_include():
+    path_filter = PathFilter(ROOT, exclude=('secret.txt',), include=('*.txt',))
+    assert path_filter.skips(f"{ROOT}/secret.txt", False)
+    assert not path_filter.skips(f"{ROOT}/public.txt", False)
+
+
+def test_no_patterns_keep_everything():
+    path_filter = PathFilter(ROOT)
+    assert not path_filter.skips(f"{ROOT}/a", False)
+    assert not path_filter.skips(f"{ROOT}/a", True)
+
+
+def test_ignore_file_applies_inside_its_directory(tmp_path):
+    root = tmp_path / 'root'
+    sub = root / 'sub'
+    sub.mkdir(parents=True)
+    (sub / IGNORE_FILE_NAME).write_text("# scratch files\n\n*.tmp\nbuild/\n/anchored.txt\n")
+    root_filter = PathFilter(str(root))
+
+    sub_filter = root_filter.enter(str(sub), list(os.scandir(sub)))
+
+    assert sub_filter.skips(str(sub / 'x.tmp'), False)
+    assert sub_filter.skips(str(sub / 'deeper' / 'x.tmp'), False)
+    assert sub_filter.skips(str(sub / 'build'), True)
+    assert sub_filter.skips(str(sub / 'anchored.txt'), False)
+    assert not sub_filter.skips(str(sub / 'deeper' / 'anchored.txt'), False)
+    assert not sub_filter.skips(str(sub / 'build'), False)
+    # The parent's filter is left as it was
+    assert not root_filter.skips(str(root / 'x.tmp'), False)
+
+
+def test_directory_without_ignore_file_keeps_the_filter(tmp_path):
+    (tmp_path / 'a').write_text('a')
+    path_filter = PathFilter(str(tmp_path), exclude=('*.tmp',))
+    assert path_filter.enter(str(tmp_path), list(os.scandir(tmp_path))) is path_filter
+
+
+def test_ignore_file_comments_and_blank_lines(tmp_path):
+    ignore_file = tmp_path / IGNORE_FILE_NAME
+    ignore_file.write_text("# comment\n\n  *.bak  \n#*.keep\nlogs/\n")
+    assert PathFilter.read_ignore_file(str(ignore_file)) == ['*.bak', 'logs/']
+
+
+def test_unreadable_ignore_file_gives_no_patterns(tmp_path):
+    assert PathFilter.read_ignore_file(str(tmp_path / IGNORE_FILE_NAME)) == []
+
+
+def test_scan_leaves_out_entries_of_ignore_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for directory in ('t/a/build', 't/b/build'):
+        os.makedirs(directory)
+    for path in ('t/a/keep', 't/a/x.tmp', 't/a/build/out', 't/b/x.tmp', 't/b/build/out'):
+        with open(path, 'w') as f:
+            f.write(path)
+    with open(os.path.join('t/a', IGNORE_FILE_NAME), 'w') as f:
+        f.write("*.tmp\nbuild/\n")
+
+    dupes = Dupes()
+    dupes.reursive_hash('t')
+    dupes.close()
+
+    store = Dupes().store
+    files = {path for kind, path, _ in store.entries() if kind == 'files'}
+    store.close()
+    assert 't/a/keep' in files
+    assert 't/a/x.tmp' not in files
+    assert 't/a/build/out' not in files
+    # The ignore file of t/a does not reach its sibling
+    assert {'t/b/x.tmp', 't/b/build/out'} <= files
+    assert dupes.excluded_count == 2
@@ -0,0 +1,108 @@
+import os
+import pytest
+import src.dupes
+from src.dupes import Dupes
+from src.hash_helper import HashHelper
+from src.scan_state import ScanState
+
+ROOTS = ['t/r0', 't/r1']
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """Two roots of nested directories, with a checkpoint after every entry."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(src.dupes, 'SCAN_CHECKPOINT_SECONDS', 0)
+    for root in ROOTS:
+        for i in range(4):
+            os.makedirs(f'{root}/d{i}/sub')
+            for j in range(5):
+                with open(f'{root}/d{i}/f{j}', 'w') as f:
+                    f.write(f'{j}')
+                with open(f'{root}/d{i}/sub/g{j}', 'w') as f:
+                    f.write(f'{root} {i} {j}')
+    return tmp_path
+
+
+def run(state: ScanState, monkeypatch, limit: int = None, **options) -> tuple:
+    """
+    Scan the roots left in state like process-dir does, stopping with a
+    KeyboardInterrupt after limit file reads.
+
+    Returns:
+        tuple: (root hashes of the finished roots, number of file reads).
+    """
+    reads = []
+    hash_file = HashHelper.hash_file
+
+    def interrupted(path, *args, **kwargs):
+        reads.append(path)
+        if limit is not None and len(reads) > limit:
+            raise KeyboardInterrupt
+        return hash_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(HashHelper, 'hash_file', staticmethod(interrupted))
+    dupes = Dupes(scan_state=state, **options)
+    state.save()
+    hashes = {}
+    try:
+        for root in list(state.roots):
+            hashes[root] = dupes.reursive_hash(root)
+            dupes.finish_root(root)
+        ScanState.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dupes.close()
+        monkeypatch.setattr(HashHelper, 'hash_file', hash_file)
+    return hashes, len(reads)
+
+
+def catalog(backend: str) -> list:
+    """List everything the catalog holds, with the hash of each entry."""
+    store = Dupes(backend=backend).store
+    entries = []
+    for kind, path, fingerprint in sorted(store.entries()):
+        stored = store.get_file(path) if kind == 'files' else store.get_dir(path)
+        entries.append((kind, path, fingerprint, stored[0]))
+    store.close()
+    return entries
+
+
+def remove_catalog() -> None:
+    for path in ('hashes.db', 'hashes.pickle', 'hashes.journal'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+@pytest.mark.parametrize('backend, jobs', [('sqlite', 1), ('pickle', 1), ('sqlite', 4)])
+def test_resumed_scan_matches_an_uninterrupted_one(tree, monkeypatch, backend, jobs):
+    reference, total = run(ScanState(ROOTS, {}), monkeypatch, backend=backend, jobs=jobs)
+    expected = catalog(backend)
+    remove_catalog()
+
+    hashes = {}
+    reads = runs = 0
+    state = ScanState(ROOTS, {})
+    while state is not None:
+        finished, count = run(state, monkeypatch, limit=7, backend=backend, jobs=jobs)
+        hashes.update(finished)
+        reads += count
+        runs += 1
+        assert runs < total, "the scan does not make progress"
+        state = ScanState.load()
+
+    assert runs > 2
+    assert hashes == reference
+    assert catalog(backend) == expected
+    # Only files read after the last checkpoint of a run are read again
+    assert reads < total * 2
+
+
+def test_checkpoint_keeps_the_stack_of_the_root_in_progress(tree, monkeypatch):
+    run(ScanState(ROOTS, {}), monkeypatch, limit=12)
+
+    state = ScanState.load()
+    assert state.roots == ROOTS
+    assert state.stack
+    assert state.stack[0][0] == 't/r0'